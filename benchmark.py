@@ -0,0 +1,359 @@
+"""
+Benchmarks of the puzzle_tools solvers over a fixed corpus of puzzles of
+every type, for proving performance changes before adopting them.
+
+Each benchmark is one solver on one puzzle of CORPUS. It is run WARMUP
+times untimed, so that caches shared between puzzles of a kind are built,
+and then REPEAT times timed. One more run counts its work with a
+puzzle_tools.SolverStats, and another measures its peak memory with
+tracemalloc, since both slow the solver down.
+
+    python3 benchmark.py                       run and print every benchmark
+    python3 benchmark.py -k sudoku -r 10       only those with "sudoku" in
+                                               their name, 10 timed runs
+    python3 benchmark.py -o baseline.json      also save the results
+    python3 benchmark.py --compare baseline.json
+                                               flag results slower, bigger
+                                               or different from a saved run
+
+With --compare, the exit status is 1 if anything regressed.
+"""
+import gc
+import json
+import platform
+import sys
+import tracemalloc
+from statistics import median
+from time import perf_counter
+from puzzle_tools import (depth_first_solve, breadth_first_solve,
+                          iddfs_solve, astar_solve, ida_star_solve,
+                          bidirectional_solve, count_nodes, SolverStats)
+
+WARMUP, REPEAT = 1, 5
+# fraction by which a median time or peak memory may grow before compare
+# flags it
+THRESHOLD = 0.10
+
+SOLVERS = {"dfs": depth_first_solve, "bfs": breadth_first_solve,
+           "iddfs": iddfs_solve, "astar": astar_solve,
+           "ida_star": ida_star_solve, "bidirectional": bidirectional_solve}
+
+
+# word set of the words file, read on first use
+_WORD_SETS = {}
+
+
+def _sudoku(line):
+    # Return the SudokuPuzzle written on line.
+    #
+    # @type line: str
+    # @rtype: SudokuPuzzle
+    from sudoku_puzzle import SudokuPuzzle
+    return SudokuPuzzle.from_line(line)
+
+
+def _mn(*rows):
+    # Return the MNPuzzle with from_grid rows, tiles separated by spaces,
+    # working towards tiles 1, 2, ... row by row with the blank last.
+    #
+    # @type rows: tuple[str]
+    # @rtype: MNPuzzle
+    from mn_puzzle import MNPuzzle
+    from_grid = tuple([tuple(row.split()) for row in rows])
+    n, m = len(from_grid), len(from_grid[0])
+    tiles = [str(i) for i in range(1, n * m)] + ["*"]
+    to_grid = tuple([tuple(tiles[row:row + m])
+                     for row in range(0, n * m, m)])
+    return MNPuzzle(from_grid, to_grid)
+
+
+def _peg(*rows):
+    # Return the GridPegSolitairePuzzle with markers rows.
+    #
+    # @type rows: tuple[str]
+    # @rtype: GridPegSolitairePuzzle
+    from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+    return GridPegSolitairePuzzle([list(row) for row in rows],
+                                  {"*", ".", "#"})
+
+
+def _ladder(from_word, to_word):
+    # Return the WordLadderPuzzle from from_word to to_word over the words
+    # file. Every such puzzle shares one word set, so the word graph built
+    # for it during warmup is reused.
+    #
+    # @type from_word: str
+    # @type to_word: str
+    # @rtype: WordLadderPuzzle
+    from word_ladder_puzzle import WordLadderPuzzle
+    if "words" not in _WORD_SETS:
+        with open("words", "r", encoding="UTF-8") as words:
+            _WORD_SETS["words"] = set(words.read().split())
+    return WordLadderPuzzle(from_word, to_word, _WORD_SETS["words"])
+
+
+def _three_kingdoms():
+    # Return the classic ThreeKingdomsPuzzle.
+    #
+    # @rtype: ThreeKingdomsPuzzle
+    from three_kingdoms_puzzle import ThreeKingdomsPuzzle
+    from piece import BigSquare, SmallSquare, HorRec, VerRec
+    return ThreeKingdomsPuzzle([
+        VerRec(1, 1), BigSquare(1, 2), VerRec(1, 4),
+        VerRec(3, 1), HorRec(3, 2), VerRec(3, 4),
+        SmallSquare(4, 2), SmallSquare(4, 3),
+        SmallSquare(5, 1), SmallSquare(5, 4)])
+
+
+# (name, function making the puzzle from scratch, names of the solvers to
+# run on it); the modules of a puzzle type are only imported when one of
+# its benchmarks runs
+CORPUS = [
+    ("sudoku 9x9 starter 1", lambda: _sudoku(
+        "...7.8.1...7.9...69.31.....35.8..6.1.........1.6..9.48"
+        ".....12.78...7.4...6.3.2..."), ["dfs"]),
+    ("sudoku 9x9 starter 2", lambda: _sudoku(
+        "...9.2....91...63..3..7..8.3.......8..9...2..5.......7"
+        ".7..8..4..45...81....3.6..."), ["dfs"]),
+    ("sudoku 9x9 starter 3", lambda: _sudoku(
+        "56...7..9.7..48.31.........43........8.....9........26"
+        ".........19.36..7.7..1...42"), ["dfs"]),
+    ("sudoku 9x9 hardest", lambda: _sudoku(
+        "8..........36......7..9.2...5...7.......457.....1...3."
+        "..1....68..85...1..9....4.."), ["dfs"]),
+    ("sudoku 16x16", lambda: _sudoku(
+        ".1G..C..F83A..7.A3.8..5...ED..G1...B..3A.2........9..."
+        "1.....8.....4GA9.E6.83.5.BE..94.2.D...F...5.D.....4G2."
+        ".EAC.....7.....E.....6...E...3A.5G.4.A8...4.CED71F2..."
+        "CE21.F...G..8.G.B..3A9.1........3.5.....7B6....7..1.F."
+        "..G2A.........7B.....2...G.4....1.F..B.."), ["dfs"]),
+    ("mn 2x3 starter", lambda: _mn("* 2 3", "1 4 5"),
+     ["dfs", "bfs", "iddfs", "astar", "ida_star", "bidirectional"]),
+    ("mn 3x3 31 moves", lambda: _mn("8 6 7", "2 5 4", "3 * 1"),
+     ["bfs", "astar", "ida_star", "bidirectional"]),
+    ("mn 4x4 50 moves", lambda: _mn(
+        "13 4 8 6", "7 * 9 14", "11 1 12 15", "5 3 2 10"),
+     ["astar", "ida_star"]),
+    ("peg 5x5 starter", lambda: _peg(
+        "*****", "*****", "*****", "**.**", "*****"), ["dfs"]),
+    ("peg 6x6", lambda: _peg(
+        "**.***", "******", "******", "******", "******", "******"),
+     ["dfs"]),
+    ("peg 4x6", lambda: _peg(
+        "*.****", "******", "******", "******"), ["bfs"]),
+    ("ladder same cost", lambda: _ladder("same", "cost"),
+     ["bfs", "astar", "bidirectional"]),
+    ("ladder stone rogue", lambda: _ladder("stone", "rogue"),
+     ["bfs", "astar", "bidirectional"]),
+    ("three kingdoms classic", _three_kingdoms, ["bfs", "astar"]),
+]
+
+
+def run_benchmark(make, solver, warmup=WARMUP, repeat=REPEAT,
+                  memory=True):
+    """
+    Return the results of solving make() with solver: the times in seconds
+    of repeat runs after warmup untimed ones, their median and minimum,
+    the number of steps in the solution (or None if there is none), the
+    SolverStats of one more run with expansions per second at the median
+    time, and, if memory, the peak memory in bytes allocated during one
+    more run.
+
+    @type make: () -> Puzzle
+    @type solver: (Puzzle) -> PuzzleNode | None
+    @type warmup: int
+    @type repeat: int
+    @type memory: bool
+    @rtype: dict[str, Any]
+
+    >>> result = run_benchmark(CORPUS[5][1], breadth_first_solve, 0, 2)
+    >>> len(result["times"]), result["steps"], result["stats"]["expanded"]
+    (2, 3, 6)
+    """
+    for _ in range(warmup):
+        solver(make())
+    times = []
+    for _ in range(repeat):
+        puzzle = make()
+        gc.collect()
+        start = perf_counter()
+        solution = solver(puzzle)
+        times.append(perf_counter() - start)
+        del solution
+    stats = SolverStats()
+    solution = solver(make(), stats=stats)
+    result = {"times": times, "median": median(times), "min": min(times),
+              "steps": None if solution is None else
+              count_nodes(solution) - 1,
+              "stats": stats.as_dict()}
+    result["expanded_per_second"] = (stats.expanded / result["median"]
+                                     if result["median"] else None)
+    del solution
+    if memory:
+        puzzle = make()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            solver(puzzle)
+            result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_corpus(pattern="", warmup=WARMUP, repeat=REPEAT, memory=True,
+               report=None):
+    """
+    Return the results of run_benchmark for every solver and puzzle of
+    CORPUS whose name, "<puzzle name> / <solver name>", contains pattern,
+    keyed by that name. report, if given, is called with each name and
+    result as they are ready.
+
+    @type pattern: str
+    @type warmup: int
+    @type repeat: int
+    @type memory: bool
+    @type report: (str, dict[str, Any]) -> None | None
+    @rtype: dict[str, dict[str, Any]]
+    """
+    results = {}
+    for name, make, solver_names in CORPUS:
+        for solver_name in solver_names:
+            key = "{} / {}".format(name, solver_name)
+            if pattern not in key:
+                continue
+            results[key] = run_benchmark(make, SOLVERS[solver_name],
+                                         warmup, repeat, memory)
+            if report is not None:
+                report(key, results[key])
+    return results
+
+
+def format_result(name, result):
+    """
+    Return a one-line summary of result of benchmark name.
+
+    @type name: str
+    @type result: dict[str, Any]
+    @rtype: str
+
+    >>> format_result("mn / bfs", {"median": 0.00123, "min": 0.001,
+    ...     "steps": 3, "expanded_per_second": 4878.0,
+    ...     "peak_memory": 20480}).split()[3:]
+    ['1.230', 'ms', '1.000', 'ms', '3', 'steps', '4878', 'exp/s', '20', 'KiB']
+    """
+    steps = "-" if result["steps"] is None else result["steps"]
+    rate = result["expanded_per_second"]
+    memory = result.get("peak_memory")
+    return "{:<38} {:>8.3f} ms {:>8.3f} ms {:>6} steps {:>10} exp/s " \
+           "{:>7} KiB".format(
+               name, 1000 * result["median"], 1000 * result["min"], steps,
+               "-" if rate is None else round(rate),
+               "-" if memory is None else memory // 1024)
+
+
+def compare_results(baseline, current, threshold=THRESHOLD):
+    """
+    Return a description of each regression of the benchmarks in current
+    against the same benchmarks in baseline: a median time or peak memory
+    more than threshold above the baseline's, or a different number of
+    solution steps.
+
+    @type baseline: dict[str, dict[str, Any]]
+    @type current: dict[str, dict[str, Any]]
+    @type threshold: float
+    @rtype: list[str]
+
+    >>> baseline = {"a": {"median": 1.0, "steps": 4, "peak_memory": 100},
+    ...             "b": {"median": 2.0, "steps": 1}}
+    >>> current = {"a": {"median": 1.25, "steps": 4, "peak_memory": 105},
+    ...            "b": {"median": 1.0, "steps": None},
+    ...            "c": {"median": 9.0, "steps": 1}}
+    >>> for line in compare_results(baseline, current):
+    ...     print(line)
+    a: median time 1000.000 ms -> 1250.000 ms (+25%)
+    b: solution steps 1 -> None
+    """
+    regressions = []
+    for name in current:
+        if name not in baseline:
+            continue
+        old, new = baseline[name], current[name]
+        if new["median"] > old["median"] * (1 + threshold):
+            regressions.append(
+                "{}: median time {:.3f} ms -> {:.3f} ms ({:+.0%})".format(
+                    name, 1000 * old["median"], 1000 * new["median"],
+                    new["median"] / old["median"] - 1))
+        if old.get("peak_memory") and new.get("peak_memory") and \
+                new["peak_memory"] > old["peak_memory"] * (1 + threshold):
+            regressions.append(
+                "{}: peak memory {} KiB -> {} KiB ({:+.0%})".format(
+                    name, old["peak_memory"] // 1024,
+                    new["peak_memory"] // 1024,
+                    new["peak_memory"] / old["peak_memory"] - 1))
+        if new["steps"] != old["steps"]:
+            regressions.append("{}: solution steps {} -> {}".format(
+                name, old["steps"], new["steps"]))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmarks selected by the command line arguments argv (by
+    default sys.argv[1:]), printing one line per benchmark, and saving or
+    comparing the results as asked.
+
+    Return the exit status.
+
+    @type argv: list[str] | None
+    @rtype: int
+    """
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark the puzzle solvers.")
+    parser.add_argument("-k", "--pattern", default="",
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument("-w", "--warmup", type=int, default=WARMUP,
+                        help="untimed runs before timing")
+    parser.add_argument("-r", "--repeat", type=int, default=REPEAT,
+                        help="timed runs")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the peak memory runs")
+    parser.add_argument("-o", "--output",
+                        help="file to save the results in as JSON")
+    parser.add_argument("--compare",
+                        help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="fraction a time or memory may grow by "
+                             "before it is flagged")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="UTF-8") as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    results = run_corpus(args.pattern, args.warmup, args.repeat,
+                         not args.no_memory,
+                         lambda name, result: print(
+                             format_result(name, result), flush=True))
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as output_file:
+            json.dump({"python": platform.python_version(),
+                       "implementation": platform.python_implementation(),
+                       "machine": platform.machine(),
+                       "warmup": args.warmup, "repeat": args.repeat,
+                       "results": results}, output_file, indent=2)
+    if baseline is not None:
+        regressions = compare_results(baseline, results, args.threshold)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            return 1
+        print("no regressions against {}".format(args.compare))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
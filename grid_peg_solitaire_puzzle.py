@@ -1,5 +1,349 @@
 from puzzle import Puzzle
 
+# _PegLayout per (rows, columns, mask of unused cells), shared by every
+# GridPegSolitairePuzzle of that board shape
+_LAYOUTS = {}
+
+
+def _peg_layout(rows, columns, unused):
+    """
+    Return the shared _PegLayout of rows x columns boards whose unused
+    cells are those in mask unused.
+
+    @type rows: int
+    @type columns: int
+    @type unused: int
+    @rtype: _PegLayout
+    """
+    key = (rows, columns, unused)
+    if key not in _LAYOUTS:
+        _LAYOUTS[key] = _PegLayout(rows, columns, unused)
+    return _LAYOUTS[key]
+
+
+class _PegLayout:
+    """
+    Jump table of one board shape for GridPegSolitairePuzzles.
+
+    Cells are numbered 0 .. rows * columns - 1 row by row, and a set of
+    cells is an int bitmask with bit i for cell i, so the pegs of a board
+    are a single int and its holes are the cells of open without a peg.
+    """
+
+    def __init__(self, rows, columns, unused):
+        """
+        Create the layout of rows x columns boards whose unused cells are
+        those in mask unused.
+
+        @type self: _PegLayout
+        @type rows: int
+        @type columns: int
+        @type unused: int
+        @rtype: None
+        """
+        self.rows, self.columns, self.unused = rows, columns, unused
+        self.width = rows * columns
+        self.byte_count = (self.width + 7) // 8
+        self.cells = (1 << self.width) - 1
+        self.open = self.cells & ~unused
+        # lines of three neighbouring open cells, in the order extensions
+        # has always used: rows, then columns
+        lines = []
+        for row in range(rows):
+            for column in range(columns - 2):
+                first = row * columns + column
+                lines.append((first, first + 1, first + 2))
+        for column in range(columns):
+            for row in range(rows - 2):
+                first = row * columns + column
+                lines.append((first, first + columns, first + 2 * columns))
+        # (mask of the line, its pegs before a jump towards its last cell,
+        # its pegs before a jump towards its first cell) per line; either
+        # jump flips every cell of the line. The board of the mask (see
+        # board) is added below.
+        self.jumps = []
+        for first, middle, last in lines:
+            mask = (1 << first) | (1 << middle) | (1 << last)
+            if mask & unused == 0:
+                self.jumps.append((mask, mask & ~(1 << last),
+                                   mask & ~(1 << first)))
+
+        # rotations and reflections, as functions of (row, column), that
+        # map the board onto itself; quarter turns and diagonal reflections
+        # only fit square boards
+        last_row, last_column = rows - 1, columns - 1
+        transforms = [lambda r, c: (r, last_column - c),
+                      lambda r, c: (last_row - r, c),
+                      lambda r, c: (last_row - r, last_column - c)]
+        if rows == columns:
+            transforms += [lambda r, c: (c, r),
+                           lambda r, c: (last_column - c, last_row - r),
+                           lambda r, c: (c, last_row - r),
+                           lambda r, c: (last_column - c, r)]
+        # per symmetry that keeps the unused cells in place, the bit of the
+        # image of each cell
+        self.symmetries = []
+        for transform in transforms:
+            images = []
+            for cell in range(self.width):
+                row, column = transform(cell // columns, cell % columns)
+                images.append(1 << (row * columns + column))
+            if all([images[cell] & unused for cell in range(self.width)
+                    if unused >> cell & 1]):
+                self.symmetries.append(images)
+        self.jumps = [jump + (self.images(jump[0]),) for jump in self.jumps]
+
+        # per distance step between neighbouring cells of a line (1 along
+        # rows, columns down columns): (step, 2 * step, mask of the first
+        # cells of the lines, of their first and middle cells, and of their
+        # middle and last cells)
+        firsts = {}
+        for mask, _, _, _ in self.jumps:
+            first = mask & -mask
+            step = ((mask ^ first) & -(mask ^ first)).bit_length() - \
+                first.bit_length()
+            firsts[step] = firsts.get(step, 0) | first
+        self.lines = [(step, 2 * step, first, first | first << step,
+                       first << step | first << 2 * step)
+                      for step, first in sorted(firsts.items())]
+
+        # position classes: cells on diagonals (row + column) % 3 == k, then
+        # on antidiagonals (row - column) % 3 == k, for k = 0, 1, 2. Every
+        # jump line has one cell of each, and a jump flips all three, so
+        # the parities of the pegs in the classes of one kind stay equal or
+        # unequal to each other for good (see signature).
+        self.classes = [0] * 6
+        for cell in range(self.width):
+            if self.open >> cell & 1:
+                row, column = divmod(cell, columns)
+                self.classes[(row + column) % 3] |= 1 << cell
+                self.classes[3 + (row - column) % 3] |= 1 << cell
+        # open cells whose lone peg has each signature: the only cells where
+        # the last peg of a board with that signature can end up
+        self.targets = [0] * 16
+        for cell in range(self.width):
+            if self.open >> cell & 1:
+                self.targets[self.signature(1 << cell)] |= 1 << cell
+        # per signature, the 0/1 pagoda function (see add_pagoda) closing
+        # its targets: a board with that signature keeps a peg on it
+        self.closures = [self._closure(targets) for targets in self.targets]
+        # further pagoda functions, as (per byte of a peg mask, the weight
+        # of the pegs of each value of that byte; per signature, the least
+        # weight of one of its targets)
+        self.pagodas = []
+
+    def _closure(self, mask):
+        # Return the least superset of cell mask mask that is a 0/1
+        # pagoda: a set such that each jump line with an end in it also has
+        # another cell in it. Lines are mended by adding their middle cell.
+        #
+        # @type self: _PegLayout
+        # @type mask: int
+        # @rtype: int
+        changed = True
+        while changed:
+            changed = False
+            for line, _, _, _ in self.jumps:
+                first = line & -line
+                last = 1 << (line.bit_length() - 1)
+                if (mask & (first | last) and
+                        (mask & line).bit_count() < 2):
+                    mask |= line ^ first ^ last
+                    changed = True
+        return mask
+
+    def add_pagoda(self, weights):
+        """
+        Add a pagoda function, given as a weight per cell, to the tests of
+        GridPegSolitairePuzzle.fail_fast on this board shape.
+
+        A pagoda function never lets a jump raise the total weight of the
+        pegs: for every jump line, the weight of each end is at most the sum
+        of the weights of the other two cells. So a board whose pegs weigh
+        less than any cell where its last peg could end is unsolvable.
+
+        @type self: _PegLayout
+        @type weights: list[int | float]
+        @rtype: None
+        """
+        for line, _, _, _ in self.jumps:
+            first, middle, last = [cell for cell in range(self.width)
+                                   if line >> cell & 1]
+            if (weights[first] > weights[middle] + weights[last] or
+                    weights[last] > weights[first] + weights[middle]):
+                raise ValueError("weights are not a pagoda function")
+        bounds = [min([weights[cell] for cell in range(self.width)
+                       if targets >> cell & 1], default=0)
+                  for targets in self.targets]
+        weights = list(weights) + [0] * (8 * self.byte_count - self.width)
+        tables = []
+        for byte in range(self.byte_count):
+            table = [0] * 256
+            for value in range(1, 256):
+                lowest = (value & -value).bit_length() - 1
+                table[value] = (table[value & (value - 1)] +
+                                weights[8 * byte + lowest])
+            tables.append(table)
+        self.pagodas.append((tables, bounds))
+
+    def weight(self, tables, pegs):
+        """
+        Return the total weight of peg mask pegs under the pagoda function
+        with byte tables tables (see pagodas).
+
+        @type self: _PegLayout
+        @type tables: list[list[int | float]]
+        @type pegs: int
+        @rtype: int | float
+        """
+        parts = pegs.to_bytes(self.byte_count, "little")
+        return sum([tables[byte][parts[byte]]
+                    for byte in range(self.byte_count)])
+
+    def signature(self, pegs):
+        """
+        Return the position class signature of peg mask pegs, which no jump
+        changes: four bits saying whether the pegs on the diagonal classes
+        0 and 1, 1 and 2, and on the antidiagonal classes 0 and 1, 1 and 2,
+        differ in parity.
+
+        @type self: _PegLayout
+        @type pegs: int
+        @rtype: int
+        """
+        parities = [(pegs & mask).bit_count() & 1 for mask in self.classes]
+        return ((parities[0] ^ parities[1]) |
+                (parities[1] ^ parities[2]) << 1 |
+                (parities[3] ^ parities[4]) << 2 |
+                (parities[4] ^ parities[5]) << 3)
+
+    def stuck(self, pegs):
+        """
+        Return the mask of pegs among pegs that no sequence of jumps can
+        ever move or remove.
+
+        A peg is stuck unless some line lets it jump over, or be jumped
+        over from, a cell that could ever hold a peg. A cell can only gain
+        a peg by a jump from two cells that hold pegs at the time, so those
+        cells are found by repeatedly adding the ends of lines whose other
+        two cells could, until every peg is freed or no more are added.
+
+        @type self: _PegLayout
+        @type pegs: int
+        @rtype: int
+        """
+        lines, movable = self.lines, 0
+        for step, _, _, before, after in lines:
+            movable |= before & (pegs >> step) | after & (pegs << step)
+        stuck, reach = pegs & ~movable, pegs
+        while stuck:
+            grown = reach
+            for step, double, first, _, _ in lines:
+                pairs = reach & (reach >> step)
+                grown |= (pairs & first) << double | (pairs >> step) & first
+            if grown == reach:
+                break
+            reach, movable = grown, 0
+            for step, _, _, before, after in lines:
+                movable |= before & (reach >> step) | after & (reach << step)
+            stuck &= ~movable
+        return stuck
+
+    def images(self, pegs):
+        """
+        Return the images of peg mask pegs under the symmetries in turn,
+        packed into one int with width bits each, the first lowest.
+
+        A jump flips the same three cells in every image, so the images
+        after a jump are those before it XOR the images of the jump's line.
+
+        @type self: _PegLayout
+        @type pegs: int
+        @rtype: int
+        """
+        cells = [cell for cell in range(self.width) if pegs >> cell & 1]
+        images = 0
+        for i in range(len(self.symmetries)):
+            image = sum([self.symmetries[i][cell] for cell in cells])
+            images |= image << (self.width * i)
+        return images
+
+    def canonical(self, pegs, images):
+        """
+        Return the least of peg mask pegs and its packed images, which is
+        the same for every rotation or reflection of a board.
+
+        @type self: _PegLayout
+        @type pegs: int
+        @type images: int
+        @rtype: int
+        """
+        width, cells = self.width, self.cells
+        for _ in range(len(self.symmetries)):
+            if images & cells < pegs:
+                pegs = images & cells
+            images >>= width
+        return pegs
+
+    def marker(self, pegs):
+        """
+        Return the markers of the board with pegs pegs.
+
+        @type self: _PegLayout
+        @type pegs: int
+        @rtype: list[list[str]]
+        """
+        marker = []
+        for row in range(self.rows):
+            marker.append([])
+            for cell in range(row * self.columns, (row + 1) * self.columns):
+                if self.unused >> cell & 1:
+                    marker[-1].append("#")
+                else:
+                    marker[-1].append("*" if pegs >> cell & 1 else ".")
+        return marker
+
+
+def register_pagoda(marker, weights):
+    """
+    Add a pagoda function for the board shape of marker to the tests of
+    GridPegSolitairePuzzle.fail_fast, given as a weight per cell in the same
+    layout as marker.
+
+    Weights must never let a jump raise the total weight of the pegs: on
+    every line of three open cells, each end weighs at most the other two
+    together. Only the "#" cells of marker matter, as they fix the shape.
+
+    @type marker: list[list[str]]
+    @type weights: list[list[int | float]]
+    @rtype: None
+
+    >>> grid = [[".", "*", "*", "*"],
+    ...         [".", "*", ".", "*"],
+    ...         [".", ".", ".", "."]]
+    >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+    False
+    >>> register_pagoda(grid, [[0, 0, 0, 0],
+    ...                        [2, 0, 2, 0],
+    ...                        [0, 0, 0, 0]])
+    >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+    True
+    >>> register_pagoda(grid, [[0, 1, 0, 0],
+    ...                        [0, 0, 0, 0],
+    ...                        [0, 0, 0, 0]])
+    Traceback (most recent call last):
+    ...
+    ValueError: weights are not a pagoda function
+    """
+    unused, bit = 0, 1
+    for row in marker:
+        for item in row:
+            if item == "#":
+                unused |= bit
+            bit <<= 1
+    layout = _peg_layout(len(marker), len(marker[0]), unused)
+    layout.add_pagoda([weight for row in weights for weight in row])
+
 
 class GridPegSolitairePuzzle(Puzzle):
     """
@@ -23,7 +367,69 @@ class GridPegSolitairePuzzle(Puzzle):
         assert all([len(x) == len(marker[0]) for x in marker[1:]])
         assert all([all(x in marker_set for x in row) for row in marker])
         assert all([x == "*" or x == "." or x == "#" for x in marker_set])
-        self._marker, self._marker_set = marker, marker_set
+        self._marker_cache, self._marker_set = marker, marker_set
+        # the shared _PegLayout of the board shape, and the pegs as a mask
+        pegs, unused, bit = 0, 0, 1
+        for row in marker:
+            for item in row:
+                if item == "*":
+                    pegs |= bit
+                elif item == "#":
+                    unused |= bit
+                bit <<= 1
+        self._layout = _peg_layout(len(marker), len(marker[0]), unused)
+        # the pegs, and their images under the symmetries of the board (see
+        # _PegLayout.images)
+        self._pegs, self._images = pegs, self._layout.images(pegs)
+        # position class signature (see _PegLayout.signature), worked out
+        # on first use and then passed on to extensions, since jumps never
+        # change it
+        self._signature = None
+
+    @classmethod
+    def _trusted(cls, layout, pegs, images, signature, marker_set):
+        # Return a GridPegSolitairePuzzle built from parts known to be
+        # consistent, with its markers left to be worked out on first use.
+        # This is how extensions are made.
+        #
+        # @type cls: type
+        # @type layout: _PegLayout
+        # @type pegs: int
+        # @type images: int
+        # @type signature: int | None
+        # @type marker_set: set[str]
+        # @rtype: GridPegSolitairePuzzle
+        puzzle = cls.__new__(cls)
+        puzzle._marker_cache, puzzle._marker_set = None, marker_set
+        puzzle._layout, puzzle._pegs, puzzle._images = layout, pegs, images
+        puzzle._signature = signature
+        return puzzle
+
+    def __getstate__(self):
+        # Replace the shared layout by its shape when pickling, as for a
+        # process pool, and leave out the markers, which are worked out
+        # again on first use.
+        state = self.__dict__.copy()
+        layout = self._layout
+        state.update(_layout=(layout.rows, layout.columns, layout.unused),
+                     _marker_cache=None)
+        return state
+
+    def __setstate__(self, state):
+        # Restore a pickled GridPegSolitairePuzzle, sharing the layout of
+        # its shape again.
+        self.__dict__.update(state)
+        self._layout = _peg_layout(*self._layout)
+
+    @property
+    def _marker(self):
+        # Return the markers of GridPegSolitairePuzzle self, row by row.
+        #
+        # @type self: GridPegSolitairePuzzle
+        # @rtype: list[list[str]]
+        if self._marker_cache is None:
+            self._marker_cache = self._layout.marker(self._pegs)
+        return self._marker_cache
 
     # TODO
     # implement __eq__, __str__ methods
@@ -59,10 +465,51 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> puzzle1 == puzzle3
         True
         """
-        return (type(self) == type(other) and
-                self._marker == other._marker and
+        if type(self) != type(other):
+            return False
+        layout, other_layout = self._layout, other._layout
+        return ((layout is other_layout or
+                 (layout.rows, layout.columns, layout.unused) ==
+                 (other_layout.rows, other_layout.columns,
+                  other_layout.unused)) and
+                self._pegs == other._pegs and
                 self._marker_set == other._marker_set)
 
+    __hash__ = Puzzle.__hash__
+
+    def state_key(self):
+        """
+        Return a hashable key for the markers of GridPegSolitairePuzzle self.
+
+        Rotations and reflections of a board are solved by the same jumps,
+        turned the same way, so they share a key: the least peg mask, with
+        bit i for cell i counting row by row, among the images of self
+        under the symmetries of its shape that keep its unused cells in
+        place. The shape is left out, since it never changes during a
+        search.
+
+        @param self: GridPegSolitairePuzzle
+        @return: int
+
+        >>> grid = [["*", "*", "*"],
+        ...         ["#", ".", "*"]]
+        >>> bin(GridPegSolitairePuzzle(grid, {"*", ".", "#"}).state_key())
+        '0b100111'
+        >>> grid1 = [["*", ".", "."],
+        ...          [".", ".", "."],
+        ...          [".", ".", "*"]]
+        >>> grid2 = [[".", ".", "*"],
+        ...          [".", ".", "."],
+        ...          ["*", ".", "."]]
+        >>> puzzle1 = GridPegSolitairePuzzle(grid1, {"*", ".", "#"})
+        >>> puzzle2 = GridPegSolitairePuzzle(grid2, {"*", ".", "#"})
+        >>> puzzle1.state_key() == puzzle2.state_key()
+        True
+        >>> puzzle1 == puzzle2
+        False
+        """
+        return self._layout.canonical(self._pegs, self._images)
+
     def __str__(self):
         """
         Return a user-friendly string representation of GridPegSolitaire self.
@@ -99,10 +546,10 @@ class GridPegSolitairePuzzle(Puzzle):
 
     def extensions(self):
         """
-        Return a list of extensions of GridPegSolitaire self.
+        Yield the extensions of GridPegSolitaire self.
 
         @param self: GridPegSolitairePuzzle
-        @return: list[GridPegSolitairePuzzle]
+        @return: generator[GridPegSolitairePuzzle]
 
         >>> grid = [["*", "*", "*", "*", "*"],
         ...         ["*", "*", "*", "*", "*"],
@@ -124,90 +571,15 @@ class GridPegSolitairePuzzle(Puzzle):
         * * * * *
         ---------
         """
-        final_list = []
-
-        # Case 1: Horizontal (peg peg empty / empty peg peg)
-        if len(self._marker[0]) >= 3:
-            for row_num in range(len(self._marker)):
-                target_row = self._marker[row_num]
-                for col_num in range(len(target_row) - 2):
-                    # if order is (peg peg empty)
-                    if (target_row[col_num] == '*' and
-                            target_row[col_num + 1] == '*' and
-                            target_row[col_num + 2] == '.'):
-                        changed_row = [item for item in target_row]
-                        # independent copy of target row for alterations
-                        changed_row[col_num] = '.'
-                        changed_row[col_num + 1] = '.'
-                        changed_row[col_num + 2] = '*'
-                        new_grid = (self._marker[:row_num] +
-                                    [changed_row] +
-                                    self._marker[row_num + 1:])
-                        final_list.append(GridPegSolitairePuzzle(
-                            new_grid, self._marker_set
-                        ))
-                    # if order is (empty peg peg):
-                    elif (target_row[col_num] == '.' and
-                            target_row[col_num + 1] == '*' and
-                            target_row[col_num + 2] == '*'):
-                        changed_row = [item for item in target_row]
-                        changed_row[col_num] = '*'
-                        changed_row[col_num + 1] = '.'
-                        changed_row[col_num + 2] = '.'
-                        new_grid = (self._marker[:row_num] +
-                                    [changed_row] +
-                                    self._marker[row_num + 1:])
-                        final_list.append(GridPegSolitairePuzzle(
-                            new_grid, self._marker_set
-                        ))
-
-        # Case 2: Vertical (peg peg empty / empty peg peg)
-        if len(self._marker) >= 3:
-            for col_num in range(len(self._marker[0])):
-                for row_num in range(len(self._marker) - 2):
-                    # if order is (peg peg empty):
-                    if (self._marker[row_num][col_num] == '*' and
-                            self._marker[row_num + 1][col_num] == '*' and
-                            self._marker[row_num + 2][col_num] == '.'):
-                        changed_row_1 = [item for item in
-                                         self._marker[row_num]]
-                        changed_row_2 = [item for item in
-                                         self._marker[row_num + 1]]
-                        changed_row_3 = [item for item in
-                                         self._marker[row_num + 2]]
-                        changed_row_1[col_num] = '.'
-                        changed_row_2[col_num] = '.'
-                        changed_row_3[col_num] = '*'
-                        new_grid = (self._marker[:row_num] +
-                                    [changed_row_1] +
-                                    [changed_row_2] +
-                                    [changed_row_3] +
-                                    self._marker[row_num + 3:])
-                        final_list.append(GridPegSolitairePuzzle(
-                            new_grid, self._marker_set
-                        ))
-                    # if order is (empty peg peg):
-                    elif (self._marker[row_num][col_num] == '.' and
-                            self._marker[row_num + 1][col_num] == '*' and
-                            self._marker[row_num + 2][col_num] == '*'):
-                        changed_row_1 = [item for item in
-                                         self._marker[row_num]]
-                        changed_row_2 = [item for item in
-                                         self._marker[row_num + 1]]
-                        changed_row_3 = [item for item in
-                                         self._marker[row_num + 2]]
-                        changed_row_1[col_num] = '*'
-                        changed_row_2[col_num] = '.'
-                        changed_row_3[col_num] = '.'
-                        new_grid = (self._marker[:row_num] +
-                                    [changed_row_1] +
-                                    [changed_row_2] +
-                                    [changed_row_3] +
-                                    self._marker[row_num + 3:])
-                        final_list.append(GridPegSolitairePuzzle(
-                            new_grid, self._marker_set
-                        ))
-        return final_list
+        # a line of three open cells allows a jump when its two pegs are
+        # next to each other and its third cell is a hole
+        pegs, images = self._pegs, self._images
+        for mask, towards_last, towards_first, flips in self._layout.jumps:
+            line = pegs & mask
+            if line == towards_last or line == towards_first:
+                yield GridPegSolitairePuzzle._trusted(
+                    self._layout, pegs ^ mask, images ^ flips,
+                    self._signature, self._marker_set)
 
     # TODO
     # override is_solved
@@ -227,12 +599,60 @@ class GridPegSolitairePuzzle(Puzzle):
         >>> puzzle.is_solved()
         True
         """
-        peg_count = 0
-        for row in self._marker:
-            for item in row:
-                if item == '*':
-                    peg_count += 1
-        return peg_count == 1
+        return self._pegs.bit_count() == 1
+
+    def fail_fast(self):
+        """
+        Return whether GridPegSolitairePuzzle self can never be solved.
+
+        The last peg must end on a cell with the position class signature
+        of self (see _PegLayout.signature), no pagoda function of the board
+        shape may weigh the pegs below every such cell (see
+        register_pagoda), and no peg may be stuck for good, except as the
+        last peg on such a cell.
+
+        @param self: GridPegSolitairePuzzle
+        @return: bool
+
+        >>> grid = [["*", "*", ".", "*", "*"]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        True
+        >>> grid = [[".", ".", "*", ".", "."],
+        ...         ["*", ".", ".", ".", "."],
+        ...         [".", ".", ".", "*", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        True
+        >>> grid = [["*", "*", ".", "*", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).fail_fast()
+        False
+        """
+        pegs, layout = self._pegs, self._layout
+        if self._signature is None:
+            self._signature = layout.signature(pegs)
+        signature = self._signature
+        targets = layout.targets[signature]
+        if not pegs & layout.closures[signature]:
+            return True
+        for tables, bounds in layout.pagodas:
+            if layout.weight(tables, pegs) < bounds[signature]:
+                return True
+        stuck = layout.stuck(pegs)
+        return bool(stuck & (stuck - 1) or stuck & ~targets)
+
+    def heuristic(self):
+        """
+        Return the number of jumps left to solve GridPegSolitairePuzzle self
+        if it can be solved: every jump removes exactly one peg, so this is
+        one less than the number of pegs.
+
+        @param self: GridPegSolitairePuzzle
+        @return: int
+
+        >>> grid = [[".", "*", "*", "*", "."]]
+        >>> GridPegSolitairePuzzle(grid, {"*", ".", "#"}).heuristic()
+        2
+        """
+        return max(self._pegs.bit_count() - 1, 0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,314 @@
+"""
+Additive pattern databases for MNPuzzles, stored on disk and
+memory-mapped, for use as the heuristic of puzzle_tools.astar_solve and
+puzzle_tools.ida_star_solve.
+
+The tiles of to_grid are split into disjoint groups. For each group, a
+table gives the fewest moves of that group's tiles needed to bring them
+from any placement to their goal cells, with every other tile ignored and
+moves of other tiles costing nothing. Since no move is counted by two
+groups, the sum of the tables is a lower bound on the moves left, and
+usually a much better one than Manhattan distance.
+
+Tables are built by breadth-first search backwards from to_grid. The
+table of a group of k tiles on an n x m board has (n * m) ** k one-byte
+entries, one per placement: the cells of its tiles, in group order, read
+as the digits of a base n * m number. Placements that cannot occur hold
+255.
+
+Database file layout, with every number an unsigned 32-bit int in native
+byte order:
+
+    header      magic bytes, then byte-order mark, n, m, number of
+                groups, size of each group and length of the symbols
+    symbols     the UTF-8 symbols of to_grid row by row, then those of
+                each group, all separated by newlines
+    tables      the tables of the groups, in order
+"""
+from array import array
+from hashlib import sha1
+import mmap
+import os
+from mn_puzzle import MNPuzzle, _goal_positions, _mn_layout
+
+_MAGIC = b"MNPATDB1"
+_BYTE_ORDER_MARK = 0x01020304
+# tiles per group chosen by default_groups, per number of cells; larger
+# groups give stronger tables but take much longer to build
+DEFAULT_GROUP_SIZES = {16: 5, 25: 4}
+# loaded PatternDatabase per absolute path
+_DATABASES = {}
+
+
+def default_groups(to_grid, size=None):
+    """
+    Return disjoint groups covering the tiles of to_grid: its tiles row by
+    row, in runs of size (by default from DEFAULT_GROUP_SIZES, or 3).
+
+    The blank and repeated symbols have no single goal cell, so they are
+    left out.
+
+    @param tuple[tuple[str]] to_grid: solution configuration
+    @param int | None size: most tiles per group
+    @rtype: list[list[str]]
+
+    >>> default_groups((("1", "2", "3"), ("4", "5", "*")), 2)
+    [['1', '2'], ['3', '4'], ['5']]
+    """
+    if size is None:
+        size = DEFAULT_GROUP_SIZES.get(len(to_grid) * len(to_grid[0]), 3)
+    goals = _goal_positions(to_grid)
+    tiles = [tile for row in to_grid for tile in row if tile in goals]
+    return [tiles[i:i + size] for i in range(0, len(tiles), size)]
+
+
+def _pattern_table(moves, cells, blank):
+    """
+    Return the table of a group whose tiles have goal cells cells, on a
+    board with move table moves and its blank at cell blank in to_grid.
+
+    The search goes level by level. Moves of tiles outside the group are
+    free, so from each placement of the group the blank reaches its whole
+    region of cells not holding a group tile at once; a move of a group
+    tile into that region costs one. Each placement and region is entered
+    once, when first reached.
+
+    @param list[list[int]] moves: neighbouring cells of each cell
+    @param list[int] cells: goal cell of each tile of the group
+    @param int blank: goal cell of the blank
+    @rtype: bytearray
+    """
+    size, k = len(moves), len(cells)
+    places = [size ** (k - 1 - i) for i in range(k)]
+    table = bytearray(b"\xff") * size ** k
+    # cells of the blank regions already entered, as a mask per placement
+    # index; an array of the smallest type holding size bits where there
+    # is one
+    for typecode in "BHIQ":
+        if array(typecode).itemsize * 8 >= size:
+            seen = array(typecode, bytes(array(typecode).itemsize *
+                                         size ** k))
+            break
+    else:
+        seen = [0] * size ** k
+
+    def enter(placement, index, start, distance):
+        # Mark the region of the blank at start, with the group's tiles at
+        # placement, as reached in distance moves, and return the entry of
+        # the search level for it.
+        #
+        # @param tuple[int] placement: cell of each tile of the group
+        # @param int index: table index of placement
+        # @param int start: cell of the blank
+        # @param int distance: moves of group tiles so far
+        # @rtype: tuple[tuple[int], int, int]
+        occupied = 0
+        for cell in placement:
+            occupied |= 1 << cell
+        # every cell of the blank's region is reached for free
+        region, stack = 1 << start, [start]
+        while stack:
+            for other in moves[stack.pop()]:
+                if not (region | occupied) >> other & 1:
+                    region |= 1 << other
+                    stack.append(other)
+        seen[index] |= region
+        if table[index] == 255:
+            table[index] = min(distance, 254)
+        return placement, index, region
+
+    index = sum([places[i] * cells[i] for i in range(k)])
+    level, distance = [enter(tuple(cells), index, blank, 0)], 0
+    while level:
+        next_level, distance = [], distance + 1
+        for placement, index, region in level:
+            # slide each group tile next to the region into it, leaving the
+            # blank where the tile was
+            for i in range(k):
+                cell = placement[i]
+                for other in moves[cell]:
+                    if region >> other & 1:
+                        moved = index + (other - cell) * places[i]
+                        if not seen[moved] >> cell & 1:
+                            next_level.append(enter(
+                                placement[:i] + (other,) + placement[i + 1:],
+                                moved, cell, distance))
+        level = next_level
+    return table
+
+
+def build_pattern_database(to_grid, groups, path):
+    """
+    Write the pattern database of to_grid with tile groups groups to path.
+
+    The file is written under a temporary name and then moved into place,
+    so processes loading the database never see it half written.
+
+    @param tuple[tuple[str]] to_grid: solution configuration
+    @param list[list[str]] groups: disjoint groups of tiles of to_grid
+    @param str path: database file
+    @rtype: None
+    """
+    goal = MNPuzzle(to_grid, to_grid)
+    goals = _goal_positions(to_grid)
+    grouped = [tile for group in groups for tile in group]
+    if len(set(grouped)) < len(grouped):
+        raise ValueError("groups must be disjoint")
+    if any([tile not in goals for tile in grouped]):
+        raise ValueError("groups must hold tiles of to_grid that occur once")
+    if sum([row.count("*") for row in to_grid]) != 1:
+        raise ValueError("to_grid must have exactly one blank")
+
+    n, m = goal.n, goal.m
+    symbols = "\n".join([tile for row in to_grid for tile in row] +
+                        grouped).encode("UTF-8")
+    header = array("I", [_BYTE_ORDER_MARK, n, m, len(groups)] +
+                   [len(group) for group in groups] + [len(symbols)])
+    moves = _mn_layout(n, m, to_grid, set().union(*to_grid)).moves
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary_path, "wb") as database_file:
+        database_file.write(_MAGIC)
+        database_file.write(header.tobytes())
+        database_file.write(symbols)
+        for group in groups:
+            database_file.write(_pattern_table(
+                moves, goal.cells_of(group), goal.cells_of(["*"])[0]))
+    os.replace(temporary_path, path)
+
+
+class PatternDatabase:
+    """
+    A memory-mapped pattern database written by build_pattern_database.
+
+    A PatternDatabase is called with an MNPuzzle working towards its
+    to_grid to get a lower bound on the moves left, so it can be passed as
+    the heuristic of puzzle_tools.astar_solve or ida_star_solve.
+    """
+
+    def __init__(self, path):
+        """
+        Map the pattern database file at path.
+
+        @param PatternDatabase self: this PatternDatabase
+        @param str path: database file
+        @rtype: None
+        """
+        with open(path, "rb") as database_file:
+            self._map = mmap.mmap(database_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        start = len(_MAGIC) + 4 * 4
+        if (len(self._map) < start or
+                self._map[:len(_MAGIC)] != _MAGIC):
+            raise ValueError("{} is not a pattern database".format(path))
+        byte_order_mark, n, m, group_count = \
+            view[len(_MAGIC):start].cast("I")
+        if byte_order_mark != _BYTE_ORDER_MARK:
+            raise ValueError(
+                "{} was written with another byte order".format(path))
+        end = start + 4 * (group_count + 1)
+        if len(self._map) < end:
+            raise ValueError("{} is truncated".format(path))
+        sizes = view[start:end].cast("I")
+        symbols = self._map[end:end + sizes[-1]].decode("UTF-8").split("\n")
+        start = end + sizes[-1]
+
+        cells = n * m
+        self.to_grid = tuple([tuple(symbols[row:row + m])
+                              for row in range(0, cells, m)])
+        self.groups = []
+        # (base n * m place value of each tile, table) per group
+        self._tables = []
+        for size in sizes[:-1]:
+            group = symbols[cells:cells + size]
+            del symbols[cells:cells + size]
+            self.groups.append(group)
+            places = [cells ** (size - 1 - i) for i in range(size)]
+            self._tables.append((places, view[start:start + cells ** size]))
+            start += cells ** size
+        if len(self._map) != start:
+            raise ValueError("{} is truncated".format(path))
+        # every grouped tile, in group order
+        self._tiles = [tile for group in self.groups for tile in group]
+
+    def __call__(self, puzzle):
+        """
+        Return a lower bound on the moves needed to solve MNPuzzle puzzle,
+        which must be working towards the to_grid of PatternDatabase self.
+
+        @param PatternDatabase self: this PatternDatabase
+        @param MNPuzzle puzzle: puzzle to estimate
+        @rtype: int
+        """
+        if puzzle.to_grid != self.to_grid:
+            raise ValueError("puzzle is working towards another to_grid")
+        cells = puzzle.cells_of(self._tiles)
+        if -1 in cells:
+            # a tile is missing, so puzzle can never be solved anyway
+            return 0
+        total, first = 0, 0
+        for places, table in self._tables:
+            index = 0
+            for i in range(len(places)):
+                index += places[i] * cells[first + i]
+            first += len(places)
+            if table[index] != 255:
+                total += table[index]
+        return total
+
+
+def load_pattern_database(to_grid, groups=None, path=None):
+    """
+    Return the PatternDatabase of to_grid with tile groups groups (by
+    default those of default_groups), stored at path (by default a file
+    in the current directory named after to_grid and groups).
+
+    The database is built if it is missing, unreadable or for another
+    to_grid or groups, and a loaded database is shared by later calls in
+    the same process.
+
+    @param tuple[tuple[str]] to_grid: solution configuration
+    @param list[list[str]] | None groups: disjoint groups of tiles
+    @param str | None path: database file
+    @rtype: PatternDatabase
+
+    >>> import tempfile
+    >>> from puzzle_tools import astar_solve, count_nodes
+    >>> directory = tempfile.TemporaryDirectory()
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    >>> path = os.path.join(directory.name, "3x3.pdb")
+    >>> database = load_pattern_database(target_grid, [["1", "2", "4"],
+    ...     ["3", "6"], ["5", "7", "8"]], path)
+    >>> start_grid = (("8", "6", "7"), ("2", "5", "4"), ("3", "*", "1"))
+    >>> puzzle = MNPuzzle(start_grid, target_grid)
+    >>> database(puzzle), puzzle.heuristic()
+    (23, 23)
+    >>> count_nodes(astar_solve(puzzle, database))
+    32
+    >>> load_pattern_database(target_grid, database.groups, path) is database
+    True
+    >>> del database
+    >>> directory.cleanup()
+    """
+    to_grid = tuple([tuple(row) for row in to_grid])
+    if groups is None:
+        groups = default_groups(to_grid)
+    groups = [list(group) for group in groups]
+    if path is None:
+        name = repr((to_grid, groups)).encode("UTF-8")
+        path = "mn_{}x{}_{}.pdb".format(len(to_grid), len(to_grid[0]),
+                                        sha1(name).hexdigest()[:12])
+    key = os.path.abspath(path)
+    database = _DATABASES.get(key)
+    if database is None or (database.to_grid, database.groups) != \
+            (to_grid, groups):
+        try:
+            database = PatternDatabase(path)
+        except (OSError, ValueError, UnicodeDecodeError):
+            database = None
+        if database is None or (database.to_grid, database.groups) != \
+                (to_grid, groups):
+            build_pattern_database(to_grid, groups, path)
+            database = PatternDatabase(path)
+        _DATABASES[key] = database
+    return database
@@ -1,4 +1,178 @@
 from puzzle import Puzzle
+from bisect import bisect_left
+from collections import OrderedDict
+
+# number of target grids whose goal positions and layouts are kept; boards
+# come from callers, so the caches below drop the least recently used
+# entries beyond it
+MN_CACHE_SIZE = 64
+# goal (row, column) of each tile, per target grid; see _goal_positions
+_GOAL_POSITIONS = OrderedDict()
+# neighbouring cells of each cell per (n, m), and _MNLayout per (n, m,
+# to_grid, frozenset of from_grid symbols), shared by all MNPuzzles of
+# that kind
+_MOVES, _LAYOUTS = {}, OrderedDict()
+
+
+def _goal_positions(to_grid):
+    """
+    Return a dict mapping each tile of to_grid to its (row, column).
+
+    The blank and any symbol occurring more than once are left out, since
+    they have no single place to aim for. Results are cached per to_grid,
+    for the MN_CACHE_SIZE most recently used ones.
+
+    @param tuple[tuple[str]] to_grid: solution configuration
+    @rtype: dict[str, tuple[int, int]]
+    """
+    if to_grid in _GOAL_POSITIONS:
+        _GOAL_POSITIONS.move_to_end(to_grid)
+    else:
+        positions, seen = {}, set()
+        for row_num, row in enumerate(to_grid):
+            for col_num, tile in enumerate(row):
+                if tile in seen:
+                    positions.pop(tile, None)
+                elif tile != "*":
+                    positions[tile] = (row_num, col_num)
+                seen.add(tile)
+        _GOAL_POSITIONS[to_grid] = positions
+        if len(_GOAL_POSITIONS) > MN_CACHE_SIZE:
+            _GOAL_POSITIONS.popitem(last=False)
+    return _GOAL_POSITIONS[to_grid]
+
+
+def _line_conflicts(goal_indices):
+    """
+    Return the fewest tiles that must leave a row (or column) so that the
+    others can slide past each other into place, given the goal indices
+    within that line of its tiles, in their current order.
+
+    That is the number of tiles outside a longest increasing subsequence.
+
+    @param list[int] goal_indices: goal indices of the tiles, in order
+    @rtype: int
+
+    >>> _line_conflicts([0, 1, 2])
+    0
+    >>> _line_conflicts([2, 1, 0])
+    2
+    """
+    tails = []
+    for index in goal_indices:
+        i = bisect_left(tails, index)
+        if i == len(tails):
+            tails.append(index)
+        else:
+            tails[i] = index
+    return len(goal_indices) - len(tails)
+
+
+def _mn_layout(n, m, to_grid, symbol_set):
+    """
+    Return the shared _MNLayout of n x m MNPuzzles working towards to_grid
+    whose from_grid uses the symbols in symbol_set. The MN_CACHE_SIZE most
+    recently used layouts are kept; puzzles hold on to their own layout
+    after it is dropped.
+
+    @param int n: number of rows
+    @param int m: number of columns
+    @param tuple[tuple[str]] to_grid: solution configuration
+    @param set[str] symbol_set: symbols of from_grid
+    @rtype: _MNLayout
+    """
+    key = (n, m, to_grid, frozenset(symbol_set))
+    if key in _LAYOUTS:
+        _LAYOUTS.move_to_end(key)
+    else:
+        if (n, m) not in _MOVES:
+            # in the order right, left, down, up of MNPuzzle.extensions
+            _MOVES[n, m] = [
+                [cell + step for step, allowed in
+                 ((1, cell % m < m - 1), (-1, cell % m > 0),
+                  (m, cell // m < n - 1), (-m, cell // m > 0)) if allowed]
+                for cell in range(n * m)]
+        _LAYOUTS[key] = _MNLayout(_MOVES[n, m], n, m, to_grid, symbol_set)
+        if len(_LAYOUTS) > MN_CACHE_SIZE:
+            _LAYOUTS.popitem(last=False)
+    return _LAYOUTS[key]
+
+
+class _MNLayout:
+    """
+    Move tables and symbol encoding shared by the n x m MNPuzzles working
+    towards one to_grid.
+
+    Cells are numbered 0 .. n * m - 1 row by row, and a board is the
+    sequence of the codes of the symbols in its cells: bytes when there
+    are at most 256 symbols, else a tuple. The blank "*" has code 0.
+    """
+
+    def __init__(self, moves, n, m, to_grid, symbol_set):
+        """
+        Create the layout of n x m MNPuzzles working towards to_grid with
+        from_grid symbols symbol_set, using the move table moves.
+
+        @param _MNLayout self: this _MNLayout
+        @param list[list[int]] moves: neighbouring cells of each cell
+        @param int n: number of rows
+        @param int m: number of columns
+        @param tuple[tuple[str]] to_grid: solution configuration
+        @param set[str] symbol_set: symbols of from_grid
+        @rtype: None
+        """
+        self.n, self.m, self.moves = n, m, moves
+        self.row_of = [cell // m for cell in range(n * m)]
+        self.column_of = [cell % m for cell in range(n * m)]
+        symbols = set(symbol_set).union(*to_grid) - {"*"}
+        self.symbol_of = ["*"] + sorted(symbols)
+        self.code_of = {}
+        for code, symbol in enumerate(self.symbol_of):
+            self.code_of[symbol] = code
+        self.pack = bytes if len(self.symbol_of) <= 256 else tuple
+        # goal row and column of each code, or -1 if it has no single place
+        goals = _goal_positions(to_grid)
+        self.goal_row = [goals[symbol][0] if symbol in goals else -1
+                         for symbol in self.symbol_of]
+        self.goal_column = [goals[symbol][1] if symbol in goals else -1
+                            for symbol in self.symbol_of]
+        # Manhattan distance of each code in each cell from its goal cell
+        self.distance = [
+            [abs(self.goal_row[code] - self.row_of[cell]) +
+             abs(self.goal_column[code] - self.column_of[cell])
+             for cell in range(n * m)] if self.goal_row[code] >= 0 else None
+            for code in range(len(self.symbol_of))]
+        # the solved board, or None if to_grid has another shape
+        if len(to_grid) == n and all([len(r) == m for r in to_grid]):
+            self.goal = self.encode(to_grid)[0]
+        else:
+            self.goal = None
+
+    def encode(self, grid):
+        """
+        Return the board of grid and the cell of its blank, or -1 if it
+        does not have exactly one blank.
+
+        @param _MNLayout self: this _MNLayout
+        @param tuple[tuple[str]] grid: configuration
+        @rtype: tuple[bytes | tuple[int], int]
+        """
+        board = self.pack([self.code_of[symbol]
+                           for row in grid for symbol in row])
+        blank = board.index(0) if board.count(0) == 1 else -1
+        return board, blank
+
+    def grid(self, board):
+        """
+        Return the configuration with board board.
+
+        @param _MNLayout self: this _MNLayout
+        @param bytes | tuple[int] board: board
+        @rtype: tuple[tuple[str]]
+        """
+        symbols = [self.symbol_of[code] for code in board]
+        return tuple([tuple(symbols[row:row + self.m])
+                      for row in range(0, len(symbols), self.m)])
 
 
 class MNPuzzle(Puzzle):
@@ -23,7 +197,61 @@ class MNPuzzle(Puzzle):
         assert all([len(r) == len(from_grid[0]) for r in from_grid])
         assert all([len(r) == len(to_grid[0]) for r in to_grid])
         self.n, self.m = len(from_grid), len(from_grid[0])
-        self.from_grid, self.to_grid = from_grid, to_grid
+        self._from_grid, self.to_grid = from_grid, to_grid
+        # the shared _MNLayout, the board of from_grid and the cell of the
+        # blank in it (see _MNLayout.encode)
+        self._layout = _mn_layout(self.n, self.m, to_grid,
+                                  set().union(*from_grid))
+        self._board, self._blank = self._layout.encode(from_grid)
+        # whether to_grid can be reached, worked out on first use and then
+        # passed on to extensions, since moves never change it
+        self._solvable = None
+
+    @classmethod
+    def _trusted(cls, layout, board, blank, to_grid, solvable):
+        # Return an MNPuzzle built from parts known to be consistent, with
+        # from_grid left to be decoded on first use. This is how extensions
+        # are made.
+        #
+        # @param type cls: MNPuzzle
+        # @param _MNLayout layout: shared layout
+        # @param bytes | tuple[int] board: board of from_grid
+        # @param int blank: cell of the blank, or -1
+        # @param tuple[tuple[str]] to_grid: solution configuration
+        # @param bool | None solvable: whether to_grid can be reached, or
+        #                              None if unknown
+        # @rtype: MNPuzzle
+        puzzle = cls.__new__(cls)
+        puzzle.n, puzzle.m = layout.n, layout.m
+        puzzle._from_grid, puzzle.to_grid = None, to_grid
+        puzzle._layout, puzzle._board, puzzle._blank = layout, board, blank
+        puzzle._solvable = solvable
+        return puzzle
+
+    def __getstate__(self):
+        # Replace the shared layout by what it is looked up by when
+        # pickling, as for a process pool, so that unpickled puzzles share
+        # it again.
+        state = self.__dict__.copy()
+        state["_layout"] = frozenset(self._layout.symbol_of)
+        return state
+
+    def __setstate__(self, state):
+        # Restore a pickled MNPuzzle, sharing the layout again.
+        self.__dict__.update(state)
+        self._layout = _mn_layout(self.n, self.m, self.to_grid, self._layout)
+
+    @property
+    def from_grid(self):
+        """
+        Return the current configuration of MNPuzzle self.
+
+        @param self: MNPuzzle
+        @return: tuple[tuple[str]]
+        """
+        if self._from_grid is None:
+            self._from_grid = self._layout.grid(self._board)
+        return self._from_grid
 
     # TODO
     # implement __eq__ and __str__
@@ -49,9 +277,31 @@ class MNPuzzle(Puzzle):
         >>> puzzle1 == puzzle3
         True
         """
-        return (type(self) == type(other) and
-                self.from_grid == other.from_grid and
-                self.to_grid == other.to_grid)
+        if type(self) != type(other) or self.to_grid != other.to_grid:
+            return False
+        if self._layout is other._layout:
+            return self._board == other._board
+        return self.from_grid == other.from_grid
+
+    __hash__ = Puzzle.__hash__
+
+    def state_key(self):
+        """
+        Return a hashable key for the current configuration of MNPuzzle self.
+
+        This is the board of codes of the symbols, row by row, with 0 for
+        the blank. The target configuration is left out, since it never
+        changes during a search.
+
+        @param self: MNPuzzle
+        @return: bytes | tuple[int]
+
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> list(MNPuzzle(start_grid, target_grid).state_key())
+        [0, 2, 3, 1, 4, 5]
+        """
+        return self._board
 
     def __str__(self):
         """
@@ -86,10 +336,10 @@ class MNPuzzle(Puzzle):
 
     def extensions(self):
         """
-        Return a list of extensions of MNPuzzle self.
+        Yield the extensions of MNPuzzle self.
 
         @param self: MNPuzzle
-        @return: list[MNPuzzle]
+        @return: generator[MNPuzzle]
 
         >>> start_grid = (("1", "*", "3"), ("2", "4", "5"))
         >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
@@ -119,81 +369,21 @@ class MNPuzzle(Puzzle):
         4 5 *
         -----
         """
-        final_list = []
-        for row_num in range(self.n):
-            for col_num in range(self.m):
-                if self.from_grid[row_num][col_num] == '*':
-                    # Case 1: symbol to the right of * exists
-                    if col_num < self.m - 1:
-                        changed_row = [x for x in self.from_grid[row_num]]
-                        changed_row[col_num] = \
-                            self.from_grid[row_num][col_num + 1]
-                        changed_row[col_num + 1] = \
-                            self.from_grid[row_num][col_num]
-                        new_grid = []
-                        for i in range(self.n):
-                            if i != row_num:
-                                new_grid.append(self.from_grid[i])
-                            else:
-                                new_grid.append(tuple(changed_row))
-                        final_list.append(MNPuzzle(
-                            tuple(new_grid), self.to_grid
-                        ))
-                    # Case 2: symbol to the left of * exists
-                    if col_num > 0:
-                        changed_row = [x for x in self.from_grid[row_num]]
-                        changed_row[col_num] = \
-                            self.from_grid[row_num][col_num - 1]
-                        changed_row[col_num - 1] = \
-                            self.from_grid[row_num][col_num]
-                        new_grid = []
-                        for i in range(self.n):
-                            if i != row_num:
-                                new_grid.append(self.from_grid[i])
-                            else:
-                                new_grid.append(tuple(changed_row))
-                        final_list.append(MNPuzzle(
-                            tuple(new_grid), self.to_grid
-                        ))
-                    # Case 3: symbol below * exists
-                    if row_num < self.n - 1:
-                        changed_row1 = [x for x in self.from_grid[row_num]]
-                        changed_row2 = [x for x in self.from_grid[row_num + 1]]
-                        changed_row1[col_num] = \
-                            self.from_grid[row_num + 1][col_num]
-                        changed_row2[col_num] = \
-                            self.from_grid[row_num][col_num]
-                        new_grid = []
-                        for i in range(self.n):
-                            if i == row_num:
-                                new_grid.append(tuple(changed_row1))
-                            elif i == row_num + 1:
-                                new_grid.append(tuple(changed_row2))
-                            else:
-                                new_grid.append(self.from_grid[i])
-                        final_list.append(MNPuzzle(
-                            tuple(new_grid), self.to_grid
-                        ))
-                    # Case 4: symbol above * exists
-                    if row_num > 0:
-                        changed_row1 = [x for x in self.from_grid[row_num - 1]]
-                        changed_row2 = [x for x in self.from_grid[row_num]]
-                        changed_row1[col_num] = \
-                            self.from_grid[row_num][col_num]
-                        changed_row2[col_num] = \
-                            self.from_grid[row_num - 1][col_num]
-                        new_grid = []
-                        for i in range(self.n):
-                            if i == row_num - 1:
-                                new_grid.append(tuple(changed_row1))
-                            elif i == row_num:
-                                new_grid.append(tuple(changed_row2))
-                            else:
-                                new_grid.append(self.from_grid[i])
-                        final_list.append(MNPuzzle(
-                            tuple(new_grid), self.to_grid
-                        ))
-        return final_list
+        layout, board, to_grid = self._layout, self._board, self.to_grid
+        if self._blank >= 0:
+            blanks = [self._blank]
+        else:
+            blanks = [cell for cell in range(len(board)) if board[cell] == 0]
+        for blank in blanks:
+            for cell in layout.moves[blank]:
+                # swap the blank with the symbol in cell
+                low, high = min(blank, cell), max(blank, cell)
+                new_board = (board[:low] + board[high:high + 1] +
+                             board[low + 1:high] + board[low:low + 1] +
+                             board[high + 1:])
+                yield MNPuzzle._trusted(
+                    layout, new_board, cell if len(blanks) == 1 else -1,
+                    to_grid, self._solvable)
 
     # TODO
     # override is_solved
@@ -212,7 +402,188 @@ class MNPuzzle(Puzzle):
         >>> puzzle.is_solved()
         True
         """
-        return self.from_grid == self.to_grid
+        return self._board == self._layout.goal
+
+    def fail_fast(self):
+        """
+        Return whether MNPuzzle self can never be solved.
+
+        @param self: MNPuzzle
+        @return: bool
+
+        >>> start_grid = (("2", "1", "3"), ("4", "5", "*"))
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle(start_grid, target_grid).fail_fast()
+        True
+        """
+        return not self.is_solvable()
+
+    def is_solvable(self):
+        """
+        Return whether to_grid can be reached from MNPuzzle self.
+
+        Each move swaps the blank with a neighbour, so it flips the parity
+        of the permutation taking from_grid to to_grid and also the parity
+        of the blank's distance (rows plus columns) from its goal cell.
+        With at least two rows and two columns, and distinct tiles, to_grid
+        is reachable exactly when those two parities agree. In a single row
+        or column the tiles can never pass each other, so their order must
+        already match. The answer is shared with all extensions of self.
+
+        @param self: MNPuzzle
+        @return: bool
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle((("*", "2", "3"), ("1", "4", "5")),
+        ...          target_grid).is_solvable()
+        True
+        >>> MNPuzzle((("2", "1", "3"), ("4", "5", "*")),
+        ...          target_grid).is_solvable()
+        False
+        >>> MNPuzzle((("2", "1", "3"), ("4", "*", "6")),
+        ...          target_grid).is_solvable()
+        False
+        >>> MNPuzzle((("1", "*", "2"),), (("1", "2", "*"),)).is_solvable()
+        True
+        >>> MNPuzzle((("2", "*", "1"),), (("1", "2", "*"),)).is_solvable()
+        False
+        """
+        if self._solvable is None:
+            self._solvable = self._check_solvable()
+        return self._solvable
+
+    def _check_solvable(self):
+        # Return whether to_grid can be reached from MNPuzzle self,
+        # ignoring the cached answer.
+        #
+        # @param MNPuzzle self: this MNPuzzle
+        # @rtype: bool
+        board, goal = self._board, self._layout.goal
+        if goal is None or sorted(board) != sorted(goal):
+            return False
+        if board == goal:
+            return True
+        if self._blank < 0:
+            # with no blank nothing moves, and with several blanks (or
+            # repeated tiles below) parity no longer decides
+            return board.count(0) > 1
+        if self.n == 1 or self.m == 1:
+            return ([code for code in board if code] ==
+                    [code for code in goal if code])
+        if len(set(goal)) < len(goal):
+            return True
+        goal_cell = {}
+        for cell in range(len(goal)):
+            goal_cell[goal[cell]] = cell
+        # parity of the permutation sending each cell's code to its goal
+        # cell: a cycle of length k is k - 1 transpositions
+        parity, seen = 0, [False] * len(board)
+        for start in range(len(board)):
+            if seen[start]:
+                continue
+            cell, length = start, 0
+            while not seen[cell]:
+                seen[cell] = True
+                cell = goal_cell[board[cell]]
+                length += 1
+            parity ^= (length - 1) & 1
+        blank_goal = goal_cell[0]
+        layout = self._layout
+        distance = (abs(layout.row_of[self._blank] - layout.row_of[blank_goal])
+                    + abs(layout.column_of[self._blank] -
+                          layout.column_of[blank_goal]))
+        return parity == distance % 2
+
+    def goal(self):
+        """
+        Return the solved MNPuzzle that MNPuzzle self is working towards.
+
+        Every move can be undone, so the inherited reverse_extensions is
+        already right.
+
+        @param self: MNPuzzle
+        @return: MNPuzzle
+
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle(start_grid, target_grid).goal().is_solved()
+        True
+        """
+        layout = self._layout
+        if layout.goal is None:
+            return MNPuzzle(self.to_grid, self.to_grid)
+        blank = layout.goal.index(0) if layout.goal.count(0) == 1 else -1
+        return MNPuzzle._trusted(layout, layout.goal, blank, self.to_grid,
+                                 True)
+
+    def cells_of(self, symbols):
+        """
+        Return the cell of each of symbols in the from_grid of MNPuzzle
+        self, numbering cells row by row from 0, or -1 for a symbol that is
+        not there.
+
+        @param self: MNPuzzle
+        @param list[str] symbols: symbols to find
+        @return: list[int]
+
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle(start_grid, target_grid).cells_of(["1", "5", "9"])
+        [3, 5, -1]
+        """
+        board, code_of = self._board, self._layout.code_of
+        cells = []
+        for symbol in symbols:
+            if symbol in code_of and code_of[symbol] in board:
+                cells.append(board.index(code_of[symbol]))
+            else:
+                cells.append(-1)
+        return cells
+
+    def heuristic(self):
+        """
+        Return a lower bound on the moves needed to solve MNPuzzle self.
+
+        This is the Manhattan distance of each tile from its place in
+        to_grid, plus the linear conflict term: two extra moves for each
+        tile that must step out of its goal row or column to let another
+        tile in that line pass.
+
+        @param self: MNPuzzle
+        @return: int
+
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> MNPuzzle(start_grid, target_grid).heuristic()
+        3
+        >>> start_grid = (("2", "1", "3"), ("4", "5", "*"))
+        >>> MNPuzzle(start_grid, target_grid).heuristic()
+        4
+        """
+        layout, board = self._layout, self._board
+        goal_row, goal_column = layout.goal_row, layout.goal_column
+        row_of, column_of = layout.row_of, layout.column_of
+        distance = layout.distance
+        total = 0
+        # goal columns of the tiles already in their goal row, per row, and
+        # goal rows of the tiles already in their goal column, per column
+        in_rows = [[] for _ in range(self.n)]
+        in_columns = [[] for _ in range(self.m)]
+        for cell in range(len(board)):
+            row = goal_row[board[cell]]
+            if row < 0:
+                continue
+            column = goal_column[board[cell]]
+            row_num, col_num = row_of[cell], column_of[cell]
+            total += distance[board[cell]][cell]
+            if row == row_num:
+                in_rows[row_num].append(column)
+            if column == col_num:
+                in_columns[col_num].append(row)
+        for line in in_rows + in_columns:
+            if len(line) > 1:
+                total += 2 * _line_conflicts(line)
+        return total
 
 if __name__ == "__main__":
     import doctest
@@ -30,7 +30,7 @@ class Puzzle:
 
     def extensions(self):
         """
-        Return list of legal extensions of Puzzle self.
+        Yield the legal extensions of Puzzle self.
 
         This is an abstract method that must be implemented
         in a subclass.
@@ -39,3 +39,75 @@ class Puzzle:
         @rtype: generator[Puzzle]
         """
         raise NotImplementedError
+
+    def goal(self):
+        """
+        Return the solved Puzzle that Puzzle self is working towards.
+
+        Override this in a subclass whose puzzles have a single known
+        solution, so that searches such as puzzle_tools.bidirectional_solve
+        can also work backwards from it.
+
+        @type self: Puzzle
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
+
+    def reverse_extensions(self):
+        """
+        Yield the puzzles that Puzzle self is a legal extension of.
+
+        The default assumes that every move can be undone by another, so
+        it yields the extensions of self. Override this in a subclass
+        where that is not so.
+
+        @type self: Puzzle
+        @rtype: generator[Puzzle]
+        """
+        return self.extensions()
+
+    def heuristic(self):
+        """
+        Return a lower bound on the number of extensions needed to get
+        from Puzzle self to a solution.
+
+        Informed searches such as puzzle_tools.astar_solve use this to
+        explore promising puzzles first. Override this in a subclass with
+        an estimate that never overestimates; the default of 0 makes those
+        searches behave like breadth-first search.
+
+        @type self: Puzzle
+        @rtype: int | float
+        """
+        return 0
+
+    def state_key(self):
+        """
+        Return a compact, immutable, hashable key for the state of Puzzle
+        self.
+
+        Puzzles that are equal must have equal keys, so the solvers in
+        puzzle_tools can use keys in place of the puzzles themselves when
+        recording visited states. Keys only need to tell apart puzzles
+        reachable from one another, so parts of a puzzle that never change
+        during a search may be left out.
+
+        Override this in a subclass with something cheaper than str(self),
+        which is the default.
+
+        @type self: Puzzle
+        @rtype: Hashable
+        """
+        return str(self)
+
+    def __hash__(self):
+        """
+        Return a hash of Puzzle self consistent with its state_key.
+
+        Subclasses that override __eq__ must set __hash__ = Puzzle.__hash__,
+        since Python otherwise makes them unhashable.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return hash(self.state_key())
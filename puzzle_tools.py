@@ -3,13 +3,8 @@ Some functions for working with puzzles
 """
 from puzzle import Puzzle
 from collections import deque
-# set higher recursion limit
-# which is needed in PuzzleNode.__str__
-# you may uncomment the next lines on a unix system such as CDF
-import resource
-resource.setrlimit(resource.RLIMIT_STACK, (2**29, -1))
-import sys
-sys.setrecursionlimit(10**6)
+from heapq import heappush, heappop
+from time import perf_counter
 
 
 # TODO
@@ -31,32 +26,318 @@ def create_node_path(lst, index=0):
     @param lst: list[Puzzle]
     @param index: int
     @return: PuzzleNode
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> words = ["lead", "load", "goad", "gold"]
+    >>> lst = [WordLadderPuzzle(w, "gold", set(words)) for w in words]
+    >>> node = create_node_path(lst)
+    >>> node.puzzle == lst[0] and node.children[0].parent is node
+    True
+    >>> count_nodes(create_node_path(lst * 10000, 1))
+    39999
     """
-    if index == len(lst) - 1:
-        return PuzzleNode(lst[index])
-    else:
-        return PuzzleNode(lst[index], [create_node_path(lst, index + 1)])
+    # build the chain from the solution end back to lst[index], so long
+    # paths never need one stack frame per step
+    node = PuzzleNode(lst[-1])
+    for i in range(len(lst) - 2, index - 1, -1):
+        child = node
+        node = PuzzleNode(lst[i], [child])
+        child.parent = node
+    return node
+
+
+def iter_path(node):
+    """
+    Yield the puzzles along the solution chain starting at node, following
+    the first child of each PuzzleNode until reaching a leaf.
+
+    @param node: PuzzleNode | None
+    @return: generator[Puzzle]
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> words = ["lead", "load", "goad", "gold"]
+    >>> lst = [WordLadderPuzzle(w, "gold", set(words)) for w in words]
+    >>> [str(p) for p in iter_path(create_node_path(lst))][-1]
+    "From 'gold' to 'gold'"
+    >>> list(iter_path(None))
+    []
+    """
+    while node is not None:
+        yield node.puzzle
+        node = node.children[0] if node.children else None
+
+
+def parent_path(puzzle, parents):
+    """
+    Return the list of puzzles from the root of a search to puzzle, by
+    following the predecessors recorded in parents. The root is the puzzle
+    whose state key maps to None.
+
+    This is a helper function for the searches that record parent pointers
+    instead of whole paths.
+
+    @param puzzle: Puzzle
+    @param parents: dict[Hashable, Puzzle | None]
+    @return: list[Puzzle]
+    """
+    path = [puzzle]
+    predecessor = parents[puzzle.state_key()]
+    while predecessor is not None:
+        path.append(predecessor)
+        predecessor = parents[predecessor.state_key()]
+    path.reverse()
+    return path
+
 
+class SolverStats:
+    """
+    Counters and timings of the solver runs it is passed to as stats.
+
+    Solvers only count and time when given a SolverStats, and one
+    SolverStats passed to several runs adds them up.
+
+    expanded            puzzles whose extensions were generated
+    generated           extensions generated
+    duplicates          extensions skipped as already seen (for the
+                        iterative deepening searches, already on the path)
+    pruned              puzzles for which fail_fast returned True
+    peak_frontier       most puzzles waiting to be expanded (for the
+                        depth-first searches, deepest stack of frames)
+    visited             largest set of seen states (for the iterative
+                        deepening searches, of states on the path)
+    extensions_time,    seconds spent inside the Puzzle methods of the
+    is_solved_time,     same names; for extensions, this is the time
+    fail_fast_time,     spent generating each extension
+    state_key_time
+
+    The frontier and visited sizes are taken each time a puzzle is
+    expanded.
 
-def depth_first_solve(puzzle):
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> words = {"lead", "load", "goad", "gold", "lend", "bead"}
+    >>> stats = SolverStats()
+    >>> count_nodes(breadth_first_solve(WordLadderPuzzle("lead", "gold",
+    ...                                                  words), stats))
+    4
+    >>> stats.expanded, stats.generated, stats.duplicates, stats.visited
+    (5, 9, 4, 5)
+    """
+
+    def __init__(self):
+        """
+        Create a new SolverStats self with every count and time at zero.
+
+        @type self: SolverStats
+        @rtype: None
+        """
+        self.expanded, self.generated = 0, 0
+        self.duplicates, self.pruned = 0, 0
+        self.peak_frontier, self.visited = 0, 0
+        self.extensions_time, self.is_solved_time = 0.0, 0.0
+        self.fail_fast_time, self.state_key_time = 0.0, 0.0
+
+    def as_dict(self):
+        """
+        Return the counts and times of SolverStats self by name.
+
+        @type self: SolverStats
+        @rtype: dict[str, int | float]
+        """
+        return dict(vars(self))
+
+    def __str__(self):
+        """
+        Return a user-friendly summary of SolverStats self.
+
+        @type self: SolverStats
+        @rtype: str
+
+        >>> print(SolverStats())
+        expanded 0, generated 0, duplicates 0, pruned 0
+        peak frontier 0, visited 0
+        seconds in extensions 0.000, is_solved 0.000
+        seconds in fail_fast 0.000, state_key 0.000
+        """
+        return ("expanded {}, generated {}, duplicates {}, pruned {}\n"
+                "peak frontier {}, visited {}\n"
+                "seconds in extensions {:.3f}, is_solved {:.3f}\n"
+                "seconds in fail_fast {:.3f}, state_key {:.3f}").format(
+            self.expanded, self.generated, self.duplicates, self.pruned,
+            self.peak_frontier, self.visited, self.extensions_time,
+            self.is_solved_time, self.fail_fast_time, self.state_key_time)
+
+    def record(self, frontier, visited):
+        """
+        Note that a solver is about to expand a puzzle with frontier
+        puzzles waiting and visited states seen.
+
+        @type self: SolverStats
+        @type frontier: int
+        @type visited: int
+        @rtype: None
+        """
+        if frontier > self.peak_frontier:
+            self.peak_frontier = frontier
+        if visited > self.visited:
+            self.visited = visited
+
+    def is_solved(self, puzzle):
+        """
+        Return puzzle.is_solved(), timed.
+
+        @type self: SolverStats
+        @type puzzle: Puzzle
+        @rtype: bool
+        """
+        start = perf_counter()
+        solved = puzzle.is_solved()
+        self.is_solved_time += perf_counter() - start
+        return solved
+
+    def fail_fast(self, puzzle):
+        """
+        Return puzzle.fail_fast(), timed and counted if True.
+
+        @type self: SolverStats
+        @type puzzle: Puzzle
+        @rtype: bool
+        """
+        start = perf_counter()
+        failed = puzzle.fail_fast()
+        self.fail_fast_time += perf_counter() - start
+        if failed:
+            self.pruned += 1
+        return failed
+
+    def state_key(self, puzzle):
+        """
+        Return puzzle.state_key(), timed.
+
+        @type self: SolverStats
+        @type puzzle: Puzzle
+        @rtype: Hashable
+        """
+        start = perf_counter()
+        key = puzzle.state_key()
+        self.state_key_time += perf_counter() - start
+        return key
+
+    def extensions(self, puzzle):
+        """
+        Yield puzzle.extensions(), counted and timed.
+
+        @type self: SolverStats
+        @type puzzle: Puzzle
+        @rtype: generator[Puzzle]
+        """
+        return self._timed(puzzle.extensions)
+
+    def reverse_extensions(self, puzzle):
+        """
+        Yield puzzle.reverse_extensions(), counted and timed.
+
+        @type self: SolverStats
+        @type puzzle: Puzzle
+        @rtype: generator[Puzzle]
+        """
+        return self._timed(puzzle.reverse_extensions)
+
+    def _timed(self, generate):
+        # Yield the puzzles from generate(), counted and timed as
+        # extensions, not counting the time spent by the caller between
+        # them.
+        #
+        # @type self: SolverStats
+        # @type generate: () -> Iterable[Puzzle]
+        # @rtype: generator[Puzzle]
+        self.expanded += 1
+        start = perf_counter()
+        for extension in generate():
+            self.extensions_time += perf_counter() - start
+            self.generated += 1
+            yield extension
+            start = perf_counter()
+        self.extensions_time += perf_counter() - start
+
+
+# the functions solvers call on puzzles when not given a SolverStats; plain
+# functions, as Python calls them faster than operator.methodcaller objects
+_PLAIN_HOOKS = (lambda puzzle: puzzle.is_solved(),
+                lambda puzzle: puzzle.fail_fast(),
+                lambda puzzle: puzzle.state_key(),
+                lambda puzzle: puzzle.extensions(),
+                lambda puzzle: puzzle.reverse_extensions())
+
+
+def solver_hooks(stats):
+    """
+    Return the functions solvers call on puzzles, in place of the Puzzle
+    methods of the same names: is_solved, fail_fast, state_key, extensions
+    and reverse_extensions, counted and timed by stats unless it is None.
+
+    Each function calls the method of the puzzle it is given, so the
+    puzzles of a search may be of different types.
+
+    @param stats: SolverStats | None
+    @return: tuple[(Puzzle) -> Any]
+
+    >>> class Done(Puzzle):
+    ...     def is_solved(self):
+    ...         return True
+    >>> class Start(Puzzle):
+    ...     def is_solved(self):
+    ...         return False
+    ...     def extensions(self):
+    ...         return [Done()]
+    >>> solvers = [depth_first_solve, iddfs_solve, breadth_first_solve,
+    ...            astar_solve, ida_star_solve]
+    >>> [count_nodes(solve(Start())) for solve in solvers]
+    [2, 2, 2, 2, 2]
+    >>> [count_nodes(solve(Start(), stats=SolverStats()))
+    ...  for solve in solvers]
+    [2, 2, 2, 2, 2]
+    """
+    if stats is None:
+        return _PLAIN_HOOKS
+    return (stats.is_solved, stats.fail_fast, stats.state_key,
+            stats.extensions, stats.reverse_extensions)
+
+
+def depth_first_solve(puzzle, depth_limit=None, stats=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child containing an extension of the puzzle
     in its parent. Return None if this is not possible.
 
+    The search backtracks through one iterator over the remaining
+    extensions of each puzzle on the current path, so besides the set of
+    visited states it only holds the current path, not every sibling
+    waiting to be tried. If depth_limit is given, only solutions at most
+    depth_limit steps from puzzle are looked for. If stats is given, the
+    run is counted and timed there.
+
     @type puzzle: Puzzle
+    @type depth_limit: int | None
+    @type stats: SolverStats | None
     @rtype: PuzzleNode | None
-    """
 
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> words = {"lead", "load", "goad", "gold", "lend", "bead"}
+    >>> count_nodes(depth_first_solve(WordLadderPuzzle("lead", "gold",
+    ...                                                words)))
+    4
+    >>> depth_first_solve(WordLadderPuzzle("lead", "gold", words), 2)
+    """
     # NOTE:
     #
     # For the three Sudoku puzzles in the starter code in
-    # sudoku_puzzle.py, the first and third are solved rather quickly
-    # (approx. 1 and 5 seconds respectively). The time needed for
-    # the second Sudoku is around 5 to 20 seconds.
+    # sudoku_puzzle.py, each is solved in about a millisecond, since
+    # SudokuPuzzle.extensions fills in forced symbols and branches on the
+    # most constrained position.
     #
-    # For the grid peg puzzle in the starter code, it solves in about 5
-    # seconds.
+    # For the grid peg puzzle in the starter code, it solves in about
+    # half a second.
+    is_solved, fail_fast, state_key, extensions, _ = solver_hooks(stats)
 
     def dfs_pathfinder(root):
         """
@@ -68,44 +349,47 @@ def depth_first_solve(puzzle):
         @type root: Puzzle
         @rtype: list[Puzzle] | None
         """
-        # initialise path, set of visited puzzle configurations, and stack
+        if fail_fast(root):
+            return None
+        # shallowest depth each state has been entered at; states are only
+        # marked once entered, so a sibling still waiting to be tried never
+        # blocks a deeper path through the same state (or, where state keys
+        # merge symmetric states, through a mirror image of it)
+        depths = {state_key(root): 0}
         path = [root]
-        visited = set()
-        visited.add(str(root))
-        stack = [root]
-
-        # while stack is not empty
-        while stack:
-            current_puzzle = stack[-1]
-            # append the current puzzle to path if it is not the last path item
-            if str(current_puzzle) != str(path[-1]):
-                path.append(current_puzzle)
-            # skip current_puzzle if it satisfies fail_fast
-            if current_puzzle.fail_fast():
-                del stack[-1]
-                del path[-1]
-                continue
-            extensions = current_puzzle.extensions()
-            # initialise counter to keep track of how many extensions of
-            # current puzzle are already visited
-            seen_count = 0
-            # loop through the extensions of current puzzle
-            for extension in extensions:
-                if extension.is_solved():
-                    path.append(extension)
-                    return path
-                elif str(extension) in visited:
-                    seen_count += 1
-                elif str(extension) not in visited:
-                    visited.add(str(extension))
-                    stack.append(extension)
-            # if there are no extensions or all extensions are already visited
-            if len(extensions) == 0 or seen_count == len(extensions):
-                del stack[-1]
-                del path[-1]
+        # one iterator over the remaining extensions per puzzle on path
+        frames = [iter(extensions(root))]
+
+        while frames:
+            extension = next(frames[-1], None)
+            if extension is None:
+                frames.pop()
+                path.pop()
+                continue
+            if is_solved(extension):
+                return path + [extension]
+            depth = len(path)
+            if depth_limit is not None and depth >= depth_limit:
+                continue
+            # with a depth limit, a state entered before is worth entering
+            # again when reached in fewer steps, as more depth is left
+            key = state_key(extension)
+            entered = depths.get(key)
+            if entered is not None and (depth_limit is None or
+                                        entered <= depth):
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            depths[key] = depth
+            if fail_fast(extension):
+                continue
+            path.append(extension)
+            if stats is not None:
+                stats.record(len(frames) + 1, len(depths))
+            frames.append(iter(extensions(extension)))
         return None
 
-    if puzzle.is_solved():
+    if is_solved(puzzle):
         return PuzzleNode(puzzle)
     final_path = dfs_pathfinder(puzzle)
     # if a path is found
@@ -114,6 +398,97 @@ def depth_first_solve(puzzle):
     else:
         return None
 
+
+def iddfs_solve(puzzle, max_depth=None, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible.
+
+    Iterative deepening: depth-limited depth-first searches with limits
+    1, 2, 3, ..., up to max_depth if given, once puzzle itself is found
+    not to be solved. Only the current path is kept in memory, so the path
+    found is a shortest one while using memory proportional to its length,
+    at the cost of repeating the shallower levels in each round. The
+    search stops once a round is not cut short by its limit, since no
+    deeper round can find more. If stats is given, the run is counted and
+    timed there.
+
+    @param puzzle: Puzzle
+    @param max_depth: int | None
+    @param stats: SolverStats | None
+    @return: PuzzleNode | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> words = {"lead", "load", "goad", "gold", "lend", "bead"}
+    >>> sol = iddfs_solve(WordLadderPuzzle("lead", "gold", words))
+    >>> [str(p) for p in iter_path(sol)][-1]
+    "From 'gold' to 'gold'"
+    >>> count_nodes(sol)
+    4
+    >>> iddfs_solve(WordLadderPuzzle("lead", "gold", words), 2)
+    >>> iddfs_solve(WordLadderPuzzle("lead", "bold", words))
+    """
+    is_solved, fail_fast, state_key, extensions, _ = solver_hooks(stats)
+
+    def limited_search(limit):
+        """
+        Return (path, cut_off) for one depth-first search that looks at
+        most limit steps from puzzle. path is the list of puzzles from
+        puzzle to a solution, or None if there is none within limit;
+        cut_off is whether any puzzle was left unexpanded at the limit.
+
+        @param limit: int
+        @return: tuple[list[Puzzle] | None, bool]
+        """
+        path, path_keys = [puzzle], [state_key(puzzle)]
+        # keys on the current path, to avoid walking in cycles
+        on_path = set(path_keys)
+        # one iterator over the remaining extensions per puzzle on path
+        frames = [iter(extensions(puzzle))]
+        cut_off = False
+
+        while frames:
+            extension = next(frames[-1], None)
+            if extension is None:
+                frames.pop()
+                path.pop()
+                on_path.discard(path_keys.pop())
+                continue
+            key = state_key(extension)
+            if key in on_path:
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            if is_solved(extension):
+                return path + [extension], cut_off
+            if fail_fast(extension):
+                continue
+            if len(path) >= limit:
+                cut_off = True
+                continue
+            path.append(extension)
+            path_keys.append(key)
+            on_path.add(key)
+            if stats is not None:
+                stats.record(len(frames) + 1, len(on_path))
+            frames.append(iter(extensions(extension)))
+        return None, cut_off
+
+    if is_solved(puzzle):
+        return PuzzleNode(puzzle)
+    if fail_fast(puzzle):
+        return None
+    limit = 1
+    while max_depth is None or limit <= max_depth:
+        final_path, cut_off = limited_search(limit)
+        if final_path:
+            return create_node_path(final_path)
+        if not cut_off:
+            return None
+        limit += 1
+    return None
+
 # TODO
 # implement breadth_first_solve
 # do NOT change the type contract
@@ -123,15 +498,19 @@ def depth_first_solve(puzzle):
 # we imported deque
 
 
-def breadth_first_solve(puzzle):
+def breadth_first_solve(puzzle, stats=None):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child PuzzleNode containing an extension
     of the puzzle in its parent.  Return None if this is not possible.
 
+    If stats is given, the run is counted and timed there.
+
     @type puzzle: Puzzle
+    @type stats: SolverStats | None
     @rtype: PuzzleNode | None
     """
+    is_solved, fail_fast, state_key, extensions, _ = solver_hooks(stats)
 
     def bfs_pathfinder(root):
         """
@@ -143,37 +522,35 @@ def breadth_first_solve(puzzle):
         @param root: Puzzle
         @return: list[Puzzle] | None
         """
-        # initialise set of visited puzzle configurations and queue of PATHS
-        visited = set()
-        visited.add(str(root))
+        # map each visited state key to the puzzle it was first reached from;
+        # the keys double as the set of visited puzzle configurations
+        parents = {state_key(root): None}
+        # the queue holds bare puzzles: paths are only rebuilt from parents
+        # once a solution is found, so each frontier node costs O(1)
         queue = deque()
+        queue.append(root)
 
-        # Following code of this helper function is heavily modified from the
-        # top answer in the web-page forum:
-        # http://stackoverflow.com/questions/8922060/how-to-trace-the-path-in-a
-        # -breadth-first-search
-
-        # append to queue the current PATH LIST, not just the root itself
-        queue.append([root])
-
+        if is_solved(root):
+            return [root]
         # while queue is not empty
         while queue:
-            path = queue.popleft()
-            # initialise the current puzzle as the last element of path
-            current_puzzle = path[-1]
-            if current_puzzle.is_solved():
-                return path
-            # loop through extensions of current puzzle
-            for extension in current_puzzle.extensions():
-                if str(extension) in visited:
+            if stats is not None:
+                stats.record(len(queue), len(parents))
+            current_puzzle = queue.popleft()
+            # loop through extensions of current puzzle as they are
+            # generated; the first solution seen is as shallow as any, since
+            # puzzles are expanded in order of depth
+            for extension in extensions(current_puzzle):
+                key = state_key(extension)
+                if key in parents:
+                    if stats is not None:
+                        stats.duplicates += 1
                     continue
-                elif extension.fail_fast():
-                    visited.add(str(extension))
-                else:
-                    visited.add(str(extension))
-                    # create a new_path by appending extension to current path
-                    new_path = list(path) + [extension]
-                    queue.append(new_path)
+                parents[key] = current_puzzle
+                if is_solved(extension):
+                    return parent_path(extension, parents)
+                if not fail_fast(extension):
+                    queue.append(extension)
         return None
 
     final_path = bfs_pathfinder(puzzle)
@@ -184,6 +561,607 @@ def breadth_first_solve(puzzle):
         return None
 
 
+def puzzle_heuristic(puzzle):
+    """
+    Return puzzle.heuristic(). This is the default heuristic of the
+    informed searches below.
+
+    @param puzzle: Puzzle
+    @return: int | float
+    """
+    return puzzle.heuristic()
+
+
+def astar_solve(puzzle, heuristic=None, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible.
+
+    Every extension costs one step, and the path found is a shortest one
+    whenever heuristic never overestimates the number of steps left. If
+    stats is given, the run is counted and timed there.
+
+    @param puzzle: Puzzle
+    @param heuristic: (Puzzle) -> int | float | None
+                      lower bound on the steps from a puzzle to a solution;
+                      defaults to Puzzle.heuristic
+    @param stats: SolverStats | None
+    @return: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> count_nodes(astar_solve(MNPuzzle(start_grid, target_grid)))
+    4
+    """
+    if heuristic is None:
+        heuristic = puzzle_heuristic
+    is_solved, fail_fast, state_key, extensions, _ = solver_hooks(stats)
+
+    root_key = state_key(puzzle)
+    # cheapest known number of steps to each state, and the puzzle each
+    # state was reached from along that cheapest path
+    costs, parents = {root_key: 0}, {root_key: None}
+    # states rejected by fail_fast are never worth revisiting
+    dead = set()
+    # entries are (f, -g, tie-breaker, g, puzzle); ties on f prefer the
+    # deeper state, and the counter keeps puzzles from being compared
+    tie = 0
+    frontier = [(heuristic(puzzle), 0, tie, 0, puzzle)]
+
+    while frontier:
+        _, _, _, g, current_puzzle = heappop(frontier)
+        # skip entries superseded by a cheaper path to the same state
+        if g > costs[state_key(current_puzzle)]:
+            continue
+        if is_solved(current_puzzle):
+            return create_node_path(parent_path(current_puzzle, parents))
+        if stats is not None:
+            stats.record(len(frontier) + 1, len(costs))
+        new_g = g + 1
+        for extension in extensions(current_puzzle):
+            key = state_key(extension)
+            if key in dead or costs.get(key, new_g + 1) <= new_g:
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            if fail_fast(extension):
+                dead.add(key)
+                continue
+            costs[key], parents[key] = new_g, current_puzzle
+            tie += 1
+            heappush(frontier, (new_g + heuristic(extension), -new_g, tie,
+                                new_g, extension))
+    return None
+
+
+def ida_star_solve(puzzle, heuristic=None, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible.
+
+    Iterative-deepening A*: a series of depth-first searches, each cut off
+    where the number of steps taken plus heuristic exceeds a bound that
+    grows between rounds. Only the current path is kept in memory, so
+    this suits large state spaces where astar_solve runs out of memory.
+    The path found is a shortest one whenever heuristic never
+    overestimates. If stats is given, the run is counted and timed there.
+
+    @param puzzle: Puzzle
+    @param heuristic: (Puzzle) -> int | float | None
+                      lower bound on the steps from a puzzle to a solution;
+                      defaults to Puzzle.heuristic
+    @param stats: SolverStats | None
+    @return: PuzzleNode | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> words = {"lead", "load", "goad", "gold", "lend", "bead"}
+    >>> sol = ida_star_solve(WordLadderPuzzle("lead", "gold", words))
+    >>> [str(p) for p in iter_path(sol)][-1]
+    "From 'gold' to 'gold'"
+    >>> count_nodes(sol)
+    4
+    """
+    if heuristic is None:
+        heuristic = puzzle_heuristic
+    is_solved, fail_fast, state_key, extensions, _ = solver_hooks(stats)
+
+    def bounded_search(bound):
+        """
+        Return (path, next_bound) for one depth-first search that prunes
+        puzzles whose steps plus heuristic exceed bound. path is the list
+        of puzzles from puzzle to a solution, or None if there is none
+        within bound; next_bound is the smallest pruned estimate.
+
+        @param bound: int | float
+        @return: tuple[list[Puzzle] | None, int | float]
+        """
+        path, path_keys = [puzzle], [state_key(puzzle)]
+        # keys on the current path, to avoid walking in cycles
+        on_path = set(path_keys)
+        # one iterator over the remaining extensions per puzzle on path
+        frames = [iter(extensions(puzzle))]
+        next_bound = float("inf")
+
+        while frames:
+            extension = next(frames[-1], None)
+            if extension is None:
+                frames.pop()
+                path.pop()
+                on_path.discard(path_keys.pop())
+                continue
+            key = state_key(extension)
+            if key in on_path:
+                if stats is not None:
+                    stats.duplicates += 1
+                continue
+            estimate = len(path) + heuristic(extension)
+            if estimate > bound:
+                next_bound = min(next_bound, estimate)
+                continue
+            if is_solved(extension):
+                return path + [extension], next_bound
+            if fail_fast(extension):
+                continue
+            path.append(extension)
+            path_keys.append(key)
+            on_path.add(key)
+            if stats is not None:
+                stats.record(len(frames) + 1, len(on_path))
+            frames.append(iter(extensions(extension)))
+        return None, next_bound
+
+    if is_solved(puzzle):
+        return PuzzleNode(puzzle)
+    bound = heuristic(puzzle)
+    while bound != float("inf"):
+        final_path, bound = bounded_search(bound)
+        if final_path:
+            return create_node_path(final_path)
+    return None
+
+
+def bidirectional_solve(puzzle, stats=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible.
+
+    Breadth-first search run from both ends at once: forwards from puzzle
+    through extensions, and backwards from puzzle.goal() through
+    reverse_extensions, always growing the smaller frontier by one level,
+    until the two meet. The path found is a shortest one. This explores
+    about 2 * b ** (d / 2) states instead of b ** d for a path of d steps
+    with b extensions per state.
+
+    The puzzles met going backwards are used in the path as they are, so
+    they must be puzzles working towards the same goal. If stats is given,
+    the run is counted and timed there.
+
+    @param puzzle: Puzzle
+    @param stats: SolverStats | None
+    @return: PuzzleNode | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> with open("words", "r", encoding='UTF-8') as words:
+    ...     word_set = set(words.read().split())
+    >>> sol = bidirectional_solve(WordLadderPuzzle("same", "cost", word_set))
+    >>> for p in iter_path(sol):
+    ...     print(p)
+    From 'same' to 'cost'
+    From 'came' to 'cost'
+    From 'case' to 'cost'
+    From 'cast' to 'cost'
+    From 'cost' to 'cost'
+    """
+    (is_solved, fail_fast, state_key, extensions,
+     reverse_extensions) = solver_hooks(stats)
+    if is_solved(puzzle):
+        return PuzzleNode(puzzle)
+    goal = puzzle.goal()
+    # per direction: predecessor (towards the end the search started from)
+    # and number of steps from that end, of each state seen
+    forward_parents = {state_key(puzzle): None}
+    backward_parents = {state_key(goal): None}
+    forward_depths = {state_key(puzzle): 0}
+    backward_depths = {state_key(goal): 0}
+    forward_layer, backward_layer = [puzzle], [goal]
+    # states rejected by fail_fast on the way forwards
+    dead = set()
+
+    while forward_layer and backward_layer:
+        forwards = len(forward_layer) <= len(backward_layer)
+        if forwards:
+            layer, parents, depths = (forward_layer, forward_parents,
+                                      forward_depths)
+            other_depths = backward_depths
+        else:
+            layer, parents, depths = (backward_layer, backward_parents,
+                                      backward_depths)
+            other_depths = forward_depths
+        next_layer = []
+        # the meeting state with the fewest steps in total
+        meeting, meeting_steps = None, None
+        for current_puzzle in layer:
+            if stats is not None:
+                stats.record(len(forward_layer) + len(backward_layer),
+                             len(forward_depths) + len(backward_depths))
+            depth = depths[state_key(current_puzzle)] + 1
+            if forwards:
+                neighbours = extensions(current_puzzle)
+            else:
+                neighbours = reverse_extensions(current_puzzle)
+            for extension in neighbours:
+                key = state_key(extension)
+                if key in depths or key in dead:
+                    if stats is not None:
+                        stats.duplicates += 1
+                    continue
+                if forwards and fail_fast(extension):
+                    dead.add(key)
+                    continue
+                parents[key], depths[key] = current_puzzle, depth
+                if key in other_depths:
+                    steps = depth + other_depths[key]
+                    if meeting is None or steps < meeting_steps:
+                        meeting, meeting_steps = extension, steps
+                else:
+                    next_layer.append(extension)
+        # every meeting found later would take at least as many steps
+        if meeting is not None:
+            path = parent_path(meeting, forward_parents)
+            successor = backward_parents[meeting.state_key()]
+            while successor is not None:
+                path.append(successor)
+                successor = backward_parents[successor.state_key()]
+            return create_node_path(path)
+        if forwards:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+    return None
+
+
+# expansions between a depth-first search worker's checks for a stop or for
+# idle workers to hand work to
+WORKER_CHECK_INTERVAL = 256
+
+
+def _shared_objects(puzzle):
+    """
+    Return the objects a parallel search from puzzle sends to each worker
+    once, rather than with every task: puzzle itself and the objects its
+    attributes refer to, such as a word set, which the puzzles reached
+    from it usually share.
+
+    This is a helper function for parallel_depth_first_solve.
+
+    @param puzzle: Puzzle
+    @return: list[Any]
+    """
+    shared, seen = [puzzle], {id(puzzle)}
+    for value in getattr(puzzle, "__dict__", {}).values():
+        if id(value) not in seen:
+            seen.add(id(value))
+            shared.append(value)
+    return shared
+
+
+def _dumps_sharing(obj, shared_ids):
+    """
+    Return obj pickled, with each object whose id is a key of shared_ids
+    written as a reference to its index there instead (see
+    _loads_sharing).
+
+    Pickling before putting on a multiprocessing.Queue makes a failure
+    raise here, where the queue's feeder thread would only print it and
+    drop the object.
+
+    This is a helper function for parallel_depth_first_solve.
+
+    @param obj: Any
+    @param shared_ids: dict[int, int]
+    @return: bytes
+
+    >>> shared = [{"same", "came"}]
+    >>> data = _dumps_sharing([shared[0], "came"],
+    ...                       {id(shared[0]): 0})
+    >>> copy = _loads_sharing(data, shared)
+    >>> copy[0] is shared[0], copy[1]
+    (True, 'came')
+    """
+    import io
+    import pickle
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = lambda value: shared_ids.get(id(value))
+    pickler.dump(obj)
+    return buffer.getvalue()
+
+
+def _loads_sharing(data, shared):
+    """
+    Return the object pickled in data by _dumps_sharing, with the
+    references written there replaced by the objects of shared.
+
+    This is a helper function for parallel_depth_first_solve.
+
+    @param data: bytes
+    @param shared: list[Any]
+    @return: Any
+    """
+    import io
+    import pickle
+    unpickler = pickle.Unpickler(io.BytesIO(data))
+    unpickler.persistent_load = shared.__getitem__
+    return unpickler.load()
+
+
+def _search_subtree(path, visited, tasks, stop, pending, idle, shared_ids):
+    """
+    Return a path from the root of a parallel search through the puzzles
+    of path to a solution, by depth-first search below the last puzzle of
+    path, or None if there is none or stop is set.
+
+    visited holds the keys of the states this worker has entered. While
+    other workers are idle, the untried extensions of the puzzle nearest
+    the top of the search that still has some are handed to them through
+    tasks, pickled with _dumps_sharing and shared_ids, with pending
+    counting them.
+
+    This is a helper function for the workers of
+    parallel_depth_first_solve.
+
+    @param path: list[Puzzle]
+    @param visited: set[Hashable]
+    @param tasks: multiprocessing.Queue
+    @param stop: multiprocessing.Event
+    @param pending: multiprocessing.Value
+    @param idle: multiprocessing.Value
+    @param shared_ids: dict[int, int]
+    @return: list[Puzzle] | None
+    """
+    root = path[-1]
+    if root.is_solved():
+        return path
+    key = root.state_key()
+    if key in visited or root.fail_fast():
+        return None
+    visited.add(key)
+    # path[first + i] is the puzzle whose remaining extensions frames[i]
+    # iterates over
+    path, first = list(path), len(path) - 1
+    frames = [iter(root.extensions())]
+    expanded = 0
+
+    while frames:
+        extension = next(frames[-1], None)
+        if extension is None:
+            frames.pop()
+            path.pop()
+            continue
+        if extension.is_solved():
+            return path + [extension]
+        key = extension.state_key()
+        if key in visited:
+            continue
+        visited.add(key)
+        if extension.fail_fast():
+            continue
+        path.append(extension)
+        frames.append(iter(extension.extensions()))
+        expanded += 1
+        if expanded % WORKER_CHECK_INTERVAL:
+            continue
+        if stop.is_set():
+            return None
+        # donate the largest untried subtrees, those nearest the top
+        for i in range(len(frames) - 1):
+            if not idle.value:
+                break
+            siblings = list(frames[i])
+            if siblings:
+                frames[i] = iter(())
+                donated = [_dumps_sharing(path[:first + i + 1] + [sibling],
+                                          shared_ids)
+                           for sibling in siblings]
+                with pending.get_lock():
+                    pending.value += len(donated)
+                for task in donated:
+                    tasks.put(task)
+                break
+    return None
+
+
+def _depth_first_worker(tasks, results, stop, pending, idle, shared):
+    """
+    Search below the task paths taken from tasks until a None task or a
+    stop, as a worker process of parallel_depth_first_solve. Tasks are
+    pickled by _dumps_sharing with the objects of shared, which each
+    worker is started with once. A solution path, pickled the same way, is
+    put on results as ("solved", data); once pending reaches zero,
+    ("exhausted", None) is put there instead, and a failure is reported as
+    ("error", traceback).
+
+    @param tasks: multiprocessing.Queue
+    @param results: multiprocessing.Queue
+    @param stop: multiprocessing.Event
+    @param pending: multiprocessing.Value
+    @param idle: multiprocessing.Value
+    @param shared: list[Any]
+    @return: None
+    """
+    import traceback
+    try:
+        shared_ids = {id(value): i for i, value in enumerate(shared)}
+        # states entered by this worker: those not leading to a solution
+        # never need entering again, whichever task reaches them
+        visited = set()
+        while True:
+            with idle.get_lock():
+                idle.value += 1
+            task = tasks.get()
+            with idle.get_lock():
+                idle.value -= 1
+            if task is None or stop.is_set():
+                break
+            solution = _search_subtree(_loads_sharing(task, shared),
+                                       visited, tasks, stop, pending, idle,
+                                       shared_ids)
+            if solution is not None:
+                results.put(("solved", _dumps_sharing(solution,
+                                                      shared_ids)))
+                stop.set()
+                break
+            # a search cut short by a stop proves nothing
+            if stop.is_set():
+                break
+            with pending.get_lock():
+                pending.value -= 1
+                exhausted = not pending.value
+            if exhausted:
+                results.put(("exhausted", None))
+    except Exception:
+        results.put(("error", traceback.format_exc()))
+        stop.set()
+    # tasks left unread once stopped need not be delivered
+    tasks.cancel_join_thread()
+
+
+def parallel_depth_first_solve(puzzle, workers=None, depth=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, with each child PuzzleNode containing an extension
+    of the puzzle in its parent.  Return None if this is not possible.
+
+    Depth-first search spread over workers processes (by default one per
+    core). puzzle is first expanded breadth-first for depth levels (by
+    default until there are at least four puzzles per worker), and the
+    subtrees below that frontier are shared out through a queue. A worker
+    that runs out of subtrees takes the next one, and while any worker is
+    idle, busy workers hand it the untried siblings nearest the top of
+    their searches, so unbalanced subtrees are split up. All workers stop
+    at the first solution found. Each worker keeps its own visited states,
+    so subtrees shared by different workers may be searched twice.
+
+    Puzzles are pickled to pass them between processes, and a puzzle that
+    cannot be pickled raises an error. puzzle and the objects its
+    attributes refer to, such as the word set of a WordLadderPuzzle, are
+    sent to each worker once as it starts, and only referred to by the
+    paths passed afterwards. The path found starts at puzzle itself, but
+    the puzzles after it are copies. A worker exiting without reporting
+    back raises RuntimeError.
+
+    @param puzzle: Puzzle
+    @param workers: int | None
+    @param depth: int | None
+    @return: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> start_grid = (("8", "6", "7"), ("2", "5", "4"), ("3", "*", "1"))
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    >>> puzzle = MNPuzzle(start_grid, target_grid)
+    >>> solution = parallel_depth_first_solve(puzzle, workers=2)
+    >>> solution.puzzle is puzzle, list(iter_path(solution))[-1].is_solved()
+    (True, True)
+    >>> start_grid = (("2", "1", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    >>> print(parallel_depth_first_solve(MNPuzzle(start_grid, target_grid),
+    ...                                  workers=2))
+    None
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> from word_index import load_word_index
+    >>> solution = parallel_depth_first_solve(
+    ...     WordLadderPuzzle("same", "cost", load_word_index("words")),
+    ...     workers=2)
+    >>> str(list(iter_path(solution))[-1])
+    "From 'cost' to 'cost'"
+    """
+    import multiprocessing
+    from queue import Empty
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1:
+        return depth_first_solve(puzzle)
+
+    if puzzle.is_solved():
+        return PuzzleNode(puzzle)
+    if puzzle.fail_fast():
+        return None
+    # paths from puzzle to each puzzle of the frontier
+    frontier, level = [[puzzle]], 0
+    visited = {puzzle.state_key()}
+    while frontier and (level < depth if depth is not None else
+                        len(frontier) < 4 * workers):
+        next_frontier = []
+        for path in frontier:
+            for extension in path[-1].extensions():
+                if extension.is_solved():
+                    return create_node_path(path + [extension])
+                key = extension.state_key()
+                if key in visited:
+                    continue
+                visited.add(key)
+                if not extension.fail_fast():
+                    next_frontier.append(path + [extension])
+        frontier, level = next_frontier, level + 1
+    if not frontier:
+        return None
+
+    # taken once the frontier is built, as expanding puzzle may have
+    # attached more to it that its extensions share, such as a WordGraph
+    shared = _shared_objects(puzzle)
+    shared_ids = {id(value): i for i, value in enumerate(shared)}
+    frontier = [_dumps_sharing(path, shared_ids) for path in frontier]
+    tasks, results = multiprocessing.Queue(), multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    pending = multiprocessing.Value("l", len(frontier))
+    idle = multiprocessing.Value("l", 0)
+    for task in frontier:
+        tasks.put(task)
+    processes = [multiprocessing.Process(
+        target=_depth_first_worker,
+        args=(tasks, results, stop, pending, idle, shared), daemon=True)
+        for _ in range(workers)]
+    try:
+        for process in processes:
+            process.start()
+        while True:
+            try:
+                outcome, value = results.get(timeout=0.1)
+                break
+            except Empty:
+                # workers only exit once they have put a result, so one
+                # that died otherwise leaves its tasks pending for ever
+                if all([process.is_alive() for process in processes]):
+                    continue
+                try:
+                    outcome, value = results.get(timeout=1)
+                    break
+                except Empty:
+                    raise RuntimeError(
+                        "a depth-first worker exited without a result")
+    finally:
+        stop.set()
+        for _ in processes:
+            tasks.put(None)
+        tasks.cancel_join_thread()
+        for process in processes:
+            if process.pid is None:
+                continue
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+    if outcome == "error":
+        raise RuntimeError("depth-first worker failed:\n" + value)
+    if outcome == "exhausted":
+        return None
+    # the path starts at puzzle itself, as it is one of the shared objects
+    return create_node_path(_loads_sharing(value, shared))
+
+
 def count_nodes(node):
     """
     Count number of nodes in tree.
@@ -193,8 +1171,13 @@ def count_nodes(node):
     """
     if not node:
         return 1
-    else:
-        return 1 + sum(count_nodes(child) for child in node.children)
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.children)
+    return count
 
 # Class PuzzleNode helps build trees of PuzzleNodes that have
 # an arbitrary number of children, and a parent.
@@ -238,17 +1221,50 @@ class PuzzleNode:
         True
         >>> pn1.__eq__(pn3)
         False
+        >>> chain = [pn1.puzzle, pn3.puzzle] * 5000
+        >>> create_node_path(chain) == create_node_path(chain)
+        True
+        >>> create_node_path(chain) == create_node_path(chain[:-1] + chain)
+        False
         """
-        return (type(self) == type(other) and
-                self.puzzle == other.puzzle and
-                all([x in self.children for x in other.children]) and
-                all([x in other.children for x in self.children]))
+        # pairs of nodes still to compare; single children are compared
+        # through this stack, so long solution chains cannot exhaust the
+        # call stack, and only nodes with several children recurse
+        pairs = [(self, other)]
+        while pairs:
+            node, other = pairs.pop()
+            if type(node) != type(other) or node.puzzle != other.puzzle:
+                return False
+            if len(node.children) == 1 and len(other.children) == 1:
+                pairs.append((node.children[0], other.children[0]))
+            elif not (all([x in node.children for x in other.children]) and
+                      all([x in other.children for x in node.children])):
+                return False
+        return True
 
     def __str__(self):
         """
         Return a human-readable string representing PuzzleNode self.
 
+        Each node is rendered as its puzzle, a blank line, and then its
+        children separated by newlines. The tree is walked with an explicit
+        stack, so deep solution chains cannot exhaust the call stack.
+
         # doctest not feasible.
         """
-        return "{}\n\n{}".format(self.puzzle,
-                                 "\n".join([str(x) for x in self.children]))
+        parts = []
+        # pending holds nodes still to render and separators still to emit,
+        # with the next item to output on top
+        pending = [self]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            parts.append(str(item.puzzle))
+            parts.append("\n\n")
+            for i in range(len(item.children) - 1, -1, -1):
+                pending.append(item.children[i])
+                if i > 0:
+                    pending.append("\n")
+        return "".join(parts)
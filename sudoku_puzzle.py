@@ -1,4 +1,209 @@
 from puzzle import Puzzle
+from itertools import islice
+
+# symbols of an n x n puzzle in the one-line format, in order; "." and "0"
+# stand for empty positions
+LINE_SYMBOLS = "123456789ABCDEFGHIJKLMNOP"
+# _SudokuTables per n, and _SudokuLayout per (n, frozenset(symbol_set)),
+# each built once and shared by every SudokuPuzzle of that kind
+_TABLES, _LAYOUTS = {}, {}
+
+
+class _SudokuTables:
+    """
+    Index tables of an n x n sudoku grid.
+
+    Positions are numbered 0 .. n**2 - 1 row by row. Units (rows, columns
+    and subsquares) are numbered 0 .. 3n - 1: rows first, then columns,
+    then subsquares.
+    """
+
+    def __init__(self, n):
+        """
+        Create the index tables of an n x n grid.
+
+        @type self: _SudokuTables
+        @type n: int
+        @rtype: None
+        """
+        r = round(n ** (1 / 2))
+        # unit numbers of the row, column and subsquare of each position
+        self.row_of = [m // n for m in range(n ** 2)]
+        self.column_of = [n + m % n for m in range(n ** 2)]
+        self.subsquare_of = [2 * n + (m // n // r) * r + (m % n) // r
+                             for m in range(n ** 2)]
+        # positions in each unit
+        self.units = [[] for _ in range(3 * n)]
+        for m in range(n ** 2):
+            self.units[self.row_of[m]].append(m)
+            self.units[self.column_of[m]].append(m)
+            self.units[self.subsquare_of[m]].append(m)
+        # other positions sharing a unit with each position
+        self.peers = [sorted((set(self.units[self.row_of[m]]) |
+                              set(self.units[self.column_of[m]]) |
+                              set(self.units[self.subsquare_of[m]])) - {m})
+                      for m in range(n ** 2)]
+
+
+def _sudoku_layout(n, symbol_set):
+    """
+    Return the shared _SudokuLayout of n x n SudokuPuzzles over symbol_set.
+
+    @type n: int
+    @type symbol_set: set[str]
+    @rtype: _SudokuLayout
+    """
+    key = (n, frozenset(symbol_set))
+    if key not in _LAYOUTS:
+        if n not in _TABLES:
+            _TABLES[n] = _SudokuTables(n)
+        _LAYOUTS[key] = _SudokuLayout(_TABLES[n], n, symbol_set)
+    return _LAYOUTS[key]
+
+
+class _SudokuLayout:
+    """
+    Index tables and symbol encoding shared by the n x n SudokuPuzzles
+    over one symbol set.
+
+    Each symbol is encoded as a single bit, so a set of symbols is an int
+    bitmask and 0 stands for "*".
+    """
+
+    def __init__(self, tables, n, symbol_set):
+        """
+        Create the layout of n x n SudokuPuzzles with symbols symbol_set,
+        using the index tables of an n x n grid.
+
+        @type self: _SudokuLayout
+        @type tables: _SudokuTables
+        @type n: int
+        @type symbol_set: set[str]
+        @rtype: None
+        """
+        self.n, self.full = n, (1 << n) - 1
+        self.row_of, self.column_of = tables.row_of, tables.column_of
+        self.subsquare_of = tables.subsquare_of
+        self.units, self.peers = tables.units, tables.peers
+        self.bit_of, self.symbol_of = {"*": 0}, {0: "*"}
+        for i, symbol in enumerate(sorted(symbol_set)):
+            self.bit_of[symbol], self.symbol_of[1 << i] = 1 << i, symbol
+
+    def board(self, symbols):
+        """
+        Return the board (grid, used) for symbols, or None if a symbol
+        occurs twice in some unit.
+
+        grid holds the bit of the symbol at each position (0 where empty),
+        and used holds the bitmask of the symbols placed in each unit.
+
+        @type self: _SudokuLayout
+        @type symbols: list[str]
+        @rtype: tuple[list[int], list[int]] | None
+        """
+        grid = [self.bit_of[symbol] for symbol in symbols]
+        used = [0] * len(self.units)
+        for m in range(len(grid)):
+            bit = grid[m]
+            if bit and not self.place(grid, used, m, bit):
+                return None
+        return grid, used
+
+    def place(self, grid, used, m, bit):
+        """
+        Put the symbol with bit at position m of board (grid, used).
+
+        Return False, leaving the board unchanged, if that symbol is
+        already used in a unit of position m.
+
+        @type self: _SudokuLayout
+        @type grid: list[int]
+        @type used: list[int]
+        @type m: int
+        @type bit: int
+        @rtype: bool
+        """
+        row, column = self.row_of[m], self.column_of[m]
+        subsquare = self.subsquare_of[m]
+        if (used[row] | used[column] | used[subsquare]) & bit:
+            return False
+        grid[m] = bit
+        used[row] |= bit
+        used[column] |= bit
+        used[subsquare] |= bit
+        return True
+
+    def propagate(self, grid, used):
+        """
+        Fill in naked singles (positions with one allowed symbol) and
+        hidden singles (symbols with one allowed position in a unit) on
+        board (grid, used) until none are left.
+
+        Return (m, candidates) where m is an empty position with the fewest
+        allowed symbols and candidates is the bitmask of those symbols,
+        (-1, 0) if the board is full, or None if the board can never be
+        completed. The board is updated in place.
+
+        @type self: _SudokuLayout
+        @type grid: list[int]
+        @type used: list[int]
+        @rtype: tuple[int, int] | None
+        """
+        row_of, column_of = self.row_of, self.column_of
+        subsquare_of, full = self.subsquare_of, self.full
+        size = len(grid)
+        while True:
+            candidates = [0] * size
+            singles = []
+            best, best_count = -1, self.n + 1
+            for m in range(size):
+                if grid[m]:
+                    continue
+                allowed = full & ~(used[row_of[m]] | used[column_of[m]] |
+                                   used[subsquare_of[m]])
+                if not allowed:
+                    return None
+                if not allowed & (allowed - 1):
+                    singles.append((m, allowed))
+                    continue
+                candidates[m] = allowed
+                count = allowed.bit_count()
+                if count < best_count:
+                    best, best_count = m, count
+            if not singles:
+                # every empty position has at least two candidates, so look
+                # for symbols that fit in only one position of a unit
+                for u in range(len(self.units)):
+                    once = twice = 0
+                    for m in self.units[u]:
+                        twice |= once & candidates[m]
+                        once |= candidates[m]
+                    if once | used[u] != full:
+                        return None
+                    hidden = once & ~twice
+                    while hidden:
+                        bit = hidden & -hidden
+                        hidden ^= bit
+                        for m in self.units[u]:
+                            if candidates[m] & bit:
+                                singles.append((m, bit))
+                                break
+            if not singles:
+                return best, candidates[best] if best >= 0 else 0
+            for m, bit in singles:
+                if grid[m] != bit and (grid[m] or
+                                       not self.place(grid, used, m, bit)):
+                    return None
+
+    def symbols(self, grid):
+        """
+        Return the list of symbols for grid.
+
+        @type self: _SudokuLayout
+        @type grid: list[int]
+        @rtype: list[str]
+        """
+        return [self.symbol_of[bit] for bit in grid]
 
 
 class SudokuPuzzle(Puzzle):
@@ -18,10 +223,21 @@ class SudokuPuzzle(Puzzle):
         """
         assert n > 0
         assert round(n ** (1 / 2)) * round(n ** (1 / 2)) == n
-        assert all([d in (symbol_set | {"*"}) for d in symbols])
+        allowed = symbol_set | {"*"}
+        assert all([d in allowed for d in symbols])
         assert len(symbol_set) == n
         assert len(symbols) == n ** 2
         self._n, self._symbols, self._symbol_set = n, symbols, symbol_set
+        # shared with all puzzles of this size and symbol set; looked up on
+        # first use
+        self._layout = None
+        # board of self (see _SudokuLayout.board), computed on first use,
+        # or carried over from the parent for extensions; () if a symbol
+        # repeats in some unit
+        self._board = None
+        # positions whose peers may have run out of candidates, if known:
+        # an extension only needs its newly chosen position re-checked
+        self._unchecked = None
 
     def __eq__(self, other):
         """
@@ -55,6 +271,28 @@ class SudokuPuzzle(Puzzle):
                 self._n == other._n and self._symbols == other._symbols and
                 self._symbol_set == other._symbol_set)
 
+    __hash__ = Puzzle.__hash__
+
+    def state_key(self):
+        """
+        Return a hashable key for the symbols of SudokuPuzzle self.
+
+        @type self: SudokuPuzzle
+        @rtype: tuple[str]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> s2 = SudokuPuzzle(4, grid[:], {"A", "B", "C", "D"})
+        >>> s.state_key() == s2.state_key()
+        True
+        >>> hash(s) == hash(s2)
+        True
+        """
+        return tuple(self._symbols)
+
     def __str__(self):
         """
         Return a human-readable string representation of SudokuPuzzle self.
@@ -117,6 +355,62 @@ class SudokuPuzzle(Puzzle):
         return("SudokuPuzzle({}, {}, {}".format(
                 repr(self._n), repr(self._symbols), repr(self._symbol_set)))
 
+    def __getstate__(self):
+        # Leave the shared layout and cached board out when pickling, as
+        # for a process pool; they are rebuilt on first use.
+        state = self.__dict__.copy()
+        state.update(_layout=None, _board=None, _unchecked=None)
+        return state
+
+    @classmethod
+    def from_line(cls, line):
+        """
+        Return the SudokuPuzzle written on line in the one-line format:
+        the n**2 positions row by row, using the first n characters of
+        LINE_SYMBOLS as symbols and "." or "0" for empty positions.
+
+        @type line: str
+        @rtype: SudokuPuzzle
+
+        >>> s = SudokuPuzzle.from_line(".2.4..1.2..03..1")
+        >>> print(s)
+        *2|*4
+        **|1*
+        -----
+        2*|**
+        3*|*1
+        >>> SudokuPuzzle.from_line("12345")
+        Traceback (most recent call last):
+        ...
+        ValueError: line of length 5 is not a sudoku
+        """
+        line = line.strip().upper()
+        n = round(len(line) ** (1 / 2))
+        if (n * n != len(line) or round(n ** (1 / 2)) ** 2 != n or
+                n > len(LINE_SYMBOLS)):
+            raise ValueError(
+                "line of length {} is not a sudoku".format(len(line)))
+        symbol_set = set(LINE_SYMBOLS[:n])
+        symbols = ["*" if c in ".0" else c for c in line]
+        for c in symbols:
+            if c != "*" and c not in symbol_set:
+                raise ValueError(
+                    "{!r} is not a symbol of a {}x{} sudoku".format(c, n, n))
+        return cls(n, symbols, symbol_set)
+
+    def to_line(self):
+        """
+        Return SudokuPuzzle self in the one-line format read by from_line,
+        with "." for empty positions.
+
+        @type self: SudokuPuzzle
+        @rtype: str
+
+        >>> SudokuPuzzle.from_line(".2.4..1.2..03..1").to_line()
+        '.2.4..1.2...3..1'
+        """
+        return "".join(["." if d == "*" else d for d in self._symbols])
+
     def is_solved(self):
         """
         Return whether SudokuPuzzle self is solved.
@@ -137,21 +431,23 @@ class SudokuPuzzle(Puzzle):
         >>> s.is_solved()
         False
         """
-        # convenient names
-        n, symbols = self._n, self._symbols
-        # no "*" left and all rows, column, subsquares have correct symbols
-        return ("*" not in symbols and
-                all([(self._row_set(i) == self._symbol_set and
-                      self._column_set(i) == self._symbol_set and
-                      self._subsquare_set(i) ==
-                      self._symbol_set) for i in range(n ** 2)]))
+        # no "*" left and no symbol repeated in a row, column or subsquare,
+        # so each of them holds every symbol exactly once
+        return "*" not in self._symbols and bool(self._get_board())
 
     def extensions(self):
         """
-        Return list of extensions of SudokuPuzzle self.
+        Yield the extensions of SudokuPuzzle self.
+
+        An extension first fills in every position forced by the symbols
+        already placed (a position with one allowed symbol, or a symbol
+        with one allowed position in a row, column or subsquare), and then
+        puts one allowed symbol at the empty position with the fewest
+        allowed symbols. There are no extensions if that filling-in runs
+        into a contradiction.
 
         @type self: SudokuPuzzle
-        @rtype: list[SudokuPuzzle]
+        @rtype: generator[SudokuPuzzle]
 
         >>> grid = ["A", "B", "C", "D"]
         >>> grid += ["C", "D", "A", "B"]
@@ -168,25 +464,29 @@ class SudokuPuzzle(Puzzle):
         >>> all([s in L1 for s in L2])
         True
         """
-        # convenient names
-        symbols, symbol_set, n = self._symbols, self._symbol_set, self._n
-        if "*" not in symbols:
-            # return an empty generator
-            return [_ for _ in []]
-        else:
-            # position of first empty position
-            i = symbols.index("*")
-            # allowed symbols at position i
-            # A | B == A.union(B)
-            allowed_symbols = (self._symbol_set -
-                               (self._row_set(i) |
-                                self._column_set(i) |
-                                self._subsquare_set(i)))
-            # list of SudokuPuzzles with each legal digit at position i
-            return (
-                [SudokuPuzzle(n,
-                 symbols[:i] + [d] + symbols[i + 1:], symbol_set)
-                 for d in allowed_symbols])
+        if "*" not in self._symbols:
+            return
+        layout, board = self._get_layout(), self._get_board()
+        if not board:
+            return
+        grid, used = board[0][:], board[1][:]
+        found = layout.propagate(grid, used)
+        if found is None:
+            return
+        m, candidates = found
+        if m == -1:
+            # filling in forced symbols completed the grid
+            yield self._extension(grid, used, [])
+            return
+        # one extension per allowed symbol at position m; after propagating
+        # every other empty position still has two or more candidates, so
+        # only the peers of m can run out of them
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            child_grid, child_used = grid[:], used[:]
+            layout.place(child_grid, child_used, m, bit)
+            yield self._extension(child_grid, child_used, [m])
 
     # TODO
     # override fail_fast
@@ -219,67 +519,257 @@ class SudokuPuzzle(Puzzle):
         >>> s.fail_fast()
         True
         """
-        for index in range(len(self._symbols)):
-            if self._symbols[index] == '*':
-                allowed_symbols = (self._symbol_set -
-                                   (self._row_set(index) |
-                                    self._column_set(index) |
-                                    self._subsquare_set(index)))
-                if not allowed_symbols:
-                    return True
+        layout, board = self._get_layout(), self._get_board()
+        # a symbol repeated in some unit can never be fixed
+        if not board:
+            return True
+        grid, used = board
+        if self._unchecked is None:
+            positions = range(len(grid))
+        else:
+            # only the peers of the positions filled since the last check
+            # can have lost their last candidate
+            positions = [p for m in self._unchecked for p in layout.peers[m]]
+        row_of, column_of = layout.row_of, layout.column_of
+        subsquare_of, full = layout.subsquare_of, layout.full
+        for m in positions:
+            if not grid[m] and not full & ~(used[row_of[m]] |
+                                             used[column_of[m]] |
+                                             used[subsquare_of[m]]):
+                return True
+        self._unchecked = []
         return False
 
+    def solve(self):
+        """
+        Return a solved SudokuPuzzle that extends SudokuPuzzle self, or
+        None if there is none.
+
+        This searches the same way as depth_first_solve over extensions,
+        but on bare bitmask boards, without building a SudokuPuzzle per
+        step.
+
+        @type self: SudokuPuzzle
+        @rtype: SudokuPuzzle | None
+
+        >>> grid = ["*", "*", "C", "*"]
+        >>> grid += ["C", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> print(SudokuPuzzle(4, grid, {"A", "B", "C", "D"}).solve())
+        DA|CB
+        CB|AD
+        -----
+        BC|DA
+        AD|BC
+        >>> grid[0] = "C"
+        >>> print(SudokuPuzzle(4, grid, {"A", "B", "C", "D"}).solve())
+        None
+        """
+        layout, board = self._get_layout(), self._get_board()
+        stack = [(board[0][:], board[1][:])] if board else []
+        while stack:
+            grid, used = stack.pop()
+            found = layout.propagate(grid, used)
+            if found is None:
+                continue
+            m, candidates = found
+            if m == -1:
+                return self._extension(grid, used, [])
+            while candidates:
+                bit = candidates & -candidates
+                candidates ^= bit
+                child_grid, child_used = grid[:], used[:]
+                layout.place(child_grid, child_used, m, bit)
+                stack.append((child_grid, child_used))
+        return None
+
     # some helper methods
-    def _row_set(self, m):
-        # Return set of symbols in row of SudokuPuzzle self's symbols
-        # where position m occurs.
+    @classmethod
+    def _trusted(cls, n, symbols, symbol_set, layout, board, unchecked):
+        # Return a SudokuPuzzle built from parts known to be consistent,
+        # skipping the validation in __init__. This is how extensions are
+        # made.
+        #
+        # @type n: int
+        # @type symbols: list[str]
+        # @type symbol_set: set[str]
+        # @type layout: _SudokuLayout
+        # @type board: tuple[list[int], list[int]] | None
+        # @type unchecked: list[int] | None
+        # @rtype: SudokuPuzzle
+        puzzle = cls.__new__(cls)
+        puzzle._n, puzzle._symbols, puzzle._symbol_set = (n, symbols,
+                                                          symbol_set)
+        puzzle._layout, puzzle._board = layout, board
+        puzzle._unchecked = unchecked
+        return puzzle
+
+    def _get_layout(self):
+        # Return the _SudokuLayout of SudokuPuzzle self.
         #
         # @type self: SudokuPuzzle
-        # @type m: int
-        assert 0 <= m < self._n ** 2
-        # convenient names
-        n, symbols = self._n, self._symbols
-        # first position in m's row
-        r = (m // n) * n
-        # set of elements from symbols[r] .. symbols[r+n-1]
-        return set([symbols[r + i] for i in range(n)])
-
-    def _column_set(self, m):
-        # Return set of symbols in column of SudokuPuzzle self's symbols
-        # where position m occurs.
+        # @rtype: _SudokuLayout
+        if self._layout is None:
+            self._layout = _sudoku_layout(self._n, self._symbol_set)
+        return self._layout
+
+    def _get_board(self):
+        # Return the board (grid, used) of SudokuPuzzle self, or () if a
+        # symbol repeats in some unit. Callers must not modify it.
         #
         # @type self: SudokuPuzzle
-        # @type m: int
-        assert 0 <= m <= self._n ** 2
-        # convenient names
-        symbols, n = self._symbols, self._n
-        # first position in m's column
-        c = m % n
-        # set of elements from symbols[c], symbols[c + n],
-        # ... symbols[c + (n * (n-1))]
-        return set([symbols[c + (i * n)] for i in range(n)])
-
-    def _subsquare_set(self, m):
-        # Return set of symbols in subsquare of SudokuPuzzle self's symbols
-        # where position m occurs.
+        # @rtype: tuple[list[int], list[int]] | tuple[]
+        if self._board is None:
+            self._board = self._get_layout().board(self._symbols) or ()
+        return self._board
+
+    def _extension(self, grid, used, unchecked):
+        # Return a SudokuPuzzle with board (grid, used) that shares the
+        # layout of SudokuPuzzle self, and whose fail_fast only needs to
+        # look at the peers of the positions in unchecked.
         #
-        # @type self: Sudoku Puzzle
-        # @type m: int
-        assert 0 <= m < self._n ** 2
-        # convenient names
-        n, symbols = self._n, self._symbols
-        # row, column where m occur
-        row, col = m // n, m % n
-        # length of subsquares
-        ss = round(n ** (1 / 2))
-        # upper-left position of m's subsquare
-        ul = (((row // ss) * ss) * n) + ((col // ss) * ss)
-        # return set of symbols from subsquare starting at ul
-        return set(
-            [symbols[ul + i + n * j] for i in range(ss) for j in range(ss)])
+        # @type self: SudokuPuzzle
+        # @type grid: list[int]
+        # @type used: list[int]
+        # @type unchecked: list[int]
+        # @rtype: SudokuPuzzle
+        return SudokuPuzzle._trusted(self._n, self._layout.symbols(grid),
+                                     self._symbol_set, self._layout,
+                                     (grid, used), unchecked)
+
+
+def _solve(puzzle):
+    """
+    Return puzzle.solve(). Process pool workers run this.
+
+    @type puzzle: SudokuPuzzle
+    @rtype: SudokuPuzzle | None
+    """
+    return puzzle.solve()
+
+
+def _solve_line(line):
+    """
+    Return the solution of the sudoku on line, in the one-line format, or
+    "" if it has none. Process pool workers run this.
+
+    @type line: str
+    @rtype: str
+    """
+    solution = SudokuPuzzle.from_line(line).solve()
+    return solution.to_line() if solution is not None else ""
+
+
+def _pool_map(function, items, workers, chunksize):
+    """
+    Yield function(item) for each of items, in order, computed by a pool of
+    workers processes, or in this process if workers is 1.
+
+    items are read and dispatched in batches, with the next batch being
+    solved while the results of the previous one are yielded, so memory
+    stays flat however many items there are.
+
+    @type function: (object) -> object
+    @type items: iterable[object]
+    @type workers: int | None
+    @type chunksize: int
+    @rtype: generator[object]
+    """
+    if workers == 1:
+        for item in items:
+            yield function(item)
+        return
+    from multiprocessing import Pool, cpu_count
+    items = iter(items)
+    batch_size = chunksize * (workers or cpu_count()) * 4
+    with Pool(workers) as pool:
+        batch = list(islice(items, batch_size))
+        pending = pool.map_async(function, batch, chunksize)
+        while batch:
+            batch = list(islice(items, batch_size))
+            following = pool.map_async(function, batch, chunksize)
+            for result in pending.get():
+                yield result
+            pending = following
+
+
+def solve_many(puzzles, workers=None, chunksize=32):
+    """
+    Yield the solution of each SudokuPuzzle in puzzles, in order, or None
+    for one without a solution.
+
+    The puzzles are solved with SudokuPuzzle.solve by a pool of workers
+    processes (one per core by default), handed chunksize puzzles at a
+    time. workers=1 solves them in this process.
+
+    @type puzzles: iterable[SudokuPuzzle]
+    @type workers: int | None
+    @type chunksize: int
+    @rtype: generator[SudokuPuzzle | None]
+
+    >>> lines = ["1.3...1...4.4..2", "..1..3..3..4.2..", ".2.4..1.2...3..1"]
+    >>> puzzles = [SudokuPuzzle.from_line(line) for line in lines]
+    >>> for solution in solve_many(puzzles, workers=1):
+    ...     print(solution.to_line() if solution else None)
+    None
+    2413134231244231
+    1234431221433421
+    """
+    return _pool_map(_solve, puzzles, workers, chunksize)
+
+
+def main(argv=None):
+    """
+    Solve the sudokus in a file, one per line in the one-line format (see
+    SudokuPuzzle.from_line), writing each solution on its own line, or an
+    empty line for a sudoku without one. Blank input lines are skipped.
+
+    Return the exit status.
+
+    @type argv: list[str] | None
+    @rtype: int
+    """
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(
+        description="Solve sudokus written one per line.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file of sudokus (default: standard input)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file for solutions (default: standard output)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--chunksize", type=int, default=32,
+                        help="sudokus handed to a worker at a time")
+    args = parser.parse_args(argv)
+
+    source = (sys.stdin if args.input == "-" else
+              open(args.input, "r", encoding="UTF-8"))
+    target = (sys.stdout if args.output == "-" else
+              open(args.output, "w", encoding="UTF-8"))
+    try:
+        lines = (line.strip() for line in source if line.strip())
+        for solution in _pool_map(_solve_line, lines, args.workers,
+                                  args.chunksize):
+            target.write(solution + "\n")
+    except ValueError as error:
+        print("error: {}".format(error), file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    return 0
 
 
 if __name__ == "__main__":
+    import sys
+    # with arguments, run as a command line solver; see main
+    if len(sys.argv) > 1:
+        sys.exit(main())
+
     import doctest
     doctest.testmod()
 
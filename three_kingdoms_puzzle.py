@@ -0,0 +1,338 @@
+from puzzle import Puzzle
+from piece import BigSquare, SmallSquare, HorRec, VerRec
+
+# the board is ROWS x COLUMNS cells, numbered 0 .. 19 row by row, and a set
+# of cells is an int bitmask with bit i for cell i
+ROWS, COLUMNS = 5, 4
+# piece types in the order their masks are kept, with (height, width) and
+# the character standing for them in str
+PIECE_TYPES = (BigSquare, SmallSquare, HorRec, VerRec)
+_SHAPES = ((2, 2), (1, 1), (1, 2), (2, 1))
+_CHARS = "BSHV"
+# top-left cell of the big square once solved: row 4, column 2 (counting
+# from 1, as Piece does), right above the opening
+GOAL_CELL = (4 - 1) * COLUMNS + 2 - 1
+
+
+def _footprint(cell, shape):
+    """
+    Return the mask of the cells covered by a piece of shape shape, as
+    (height, width), with its top-left corner at cell.
+
+    @type cell: int
+    @type shape: tuple[int, int]
+    @rtype: int
+    """
+    height, width = shape
+    row_mask = (1 << width) - 1
+    mask = 0
+    for row in range(height):
+        mask |= row_mask << (cell + row * COLUMNS)
+    return mask
+
+
+def _slide_table(shape):
+    """
+    Return, for every top-left cell a piece of shape shape can have, the
+    footprint of the piece there and its one-cell slides, as a list of
+    (footprint, slides) indexed by cell, or None where the piece does not
+    fit. Each slide is (new top-left cell, cells that must be empty, cells
+    that change between occupied and empty).
+
+    @type shape: tuple[int, int]
+    @rtype: list[tuple[int, list[tuple[int, int, int]]] | None]
+    """
+    height, width = shape
+    table = []
+    for cell in range(ROWS * COLUMNS):
+        row, column = divmod(cell, COLUMNS)
+        if row + height > ROWS or column + width > COLUMNS:
+            table.append(None)
+            continue
+        footprint = _footprint(cell, shape)
+        slides = []
+        for row_step, column_step in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+            new_row, new_column = row + row_step, column + column_step
+            if (0 <= new_row <= ROWS - height and
+                    0 <= new_column <= COLUMNS - width):
+                new_cell = new_row * COLUMNS + new_column
+                moved = _footprint(new_cell, shape)
+                slides.append((new_cell, moved & ~footprint,
+                               moved ^ footprint))
+        table.append((footprint, slides))
+    return table
+
+
+# _slide_table of each piece type, in PIECE_TYPES order
+_SLIDES = [_slide_table(shape) for shape in _SHAPES]
+
+
+class ThreeKingdomsPuzzle(Puzzle):
+    """
+    Snapshot of the Three Kingdoms sliding block puzzle (also known as
+    Klotski): pieces on a 5 x 4 board slide one cell at a time into empty
+    cells, until the big square reaches the opening in the middle of the
+    bottom edge.
+
+    Pieces of one type are interchangeable, so a puzzle is kept as one
+    mask per type of the top-left cells of its pieces, along with the mask
+    of occupied cells.
+    """
+
+    def __init__(self, pieces):
+        """
+        Create a new ThreeKingdomsPuzzle self with pieces placed on the
+        board, which must not overlap.
+
+        @type self: ThreeKingdomsPuzzle
+        @type pieces: list[Piece]
+        @rtype: None
+        """
+        corners, occupied = [0, 0, 0, 0], 0
+        for piece in pieces:
+            assert type(piece) in PIECE_TYPES
+            kind = PIECE_TYPES.index(type(piece))
+            cell = (piece.row - 1) * COLUMNS + piece.col - 1
+            footprint = _SLIDES[kind][cell][0]
+            assert not footprint & occupied
+            corners[kind] |= 1 << cell
+            occupied |= footprint
+        self._corners, self._occupied = tuple(corners), occupied
+
+    @classmethod
+    def _trusted(cls, corners, occupied):
+        # Return a ThreeKingdomsPuzzle built from masks known to be
+        # consistent. This is how extensions are made.
+        #
+        # @type cls: type
+        # @type corners: tuple[int]
+        # @type occupied: int
+        # @rtype: ThreeKingdomsPuzzle
+        puzzle = cls.__new__(cls)
+        puzzle._corners, puzzle._occupied = corners, occupied
+        return puzzle
+
+    def pieces(self):
+        """
+        Return the pieces of ThreeKingdomsPuzzle self, ordered by type and
+        then by top-left corner.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: list[Piece]
+
+        >>> puzzle = ThreeKingdomsPuzzle([VerRec(1, 4), BigSquare(4, 1)])
+        >>> for piece in puzzle.pieces():
+        ...     print(piece)
+        <class 'piece.BigSquare'>, (4, 1)
+        <class 'piece.VerRec'>, (1, 4)
+        """
+        pieces = []
+        for kind in range(len(PIECE_TYPES)):
+            for cell in range(ROWS * COLUMNS):
+                if self._corners[kind] >> cell & 1:
+                    row, column = divmod(cell, COLUMNS)
+                    pieces.append(PIECE_TYPES[kind](row + 1, column + 1))
+        return pieces
+
+    def __eq__(self, other):
+        """
+        Return whether ThreeKingdomsPuzzle self is equivalent to other,
+        that is, has pieces of the same types in the same places.
+
+        @type self: ThreeKingdomsPuzzle
+        @type other: ThreeKingdomsPuzzle | Any
+        @rtype: bool
+
+        >>> puzzle1 = ThreeKingdomsPuzzle([SmallSquare(1, 1),
+        ...                                SmallSquare(1, 2)])
+        >>> puzzle2 = ThreeKingdomsPuzzle([SmallSquare(1, 2),
+        ...                                SmallSquare(1, 1)])
+        >>> puzzle3 = ThreeKingdomsPuzzle([HorRec(1, 1)])
+        >>> puzzle1 == puzzle2, puzzle1 == puzzle3
+        (True, False)
+        """
+        return (type(self) == type(other) and
+                self._corners == other._corners)
+
+    __hash__ = Puzzle.__hash__
+
+    def state_key(self):
+        """
+        Return a hashable key for the pieces of ThreeKingdomsPuzzle self:
+        the top-left corner masks of its big squares, small squares,
+        horizontal and vertical rectangles, 20 bits each from the lowest.
+
+        Pieces of the same type are interchangeable, so puzzles that only
+        differ by swapping such pieces share a key.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: int
+
+        >>> hex(ThreeKingdomsPuzzle([BigSquare(1, 1),
+        ...                          SmallSquare(5, 4)]).state_key())
+        '0x8000000001'
+        """
+        big, small, horizontal, vertical = self._corners
+        return big | small << 20 | horizontal << 40 | vertical << 60
+
+    def __str__(self):
+        """
+        Return a user-friendly string representation of ThreeKingdomsPuzzle
+        self, with "B" for big squares, "S" for small squares, "H" and "V"
+        for horizontal and vertical rectangles, and "." for empty cells.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: str
+
+        >>> print(ThreeKingdomsPuzzle([VerRec(1, 1), BigSquare(1, 2),
+        ...                            HorRec(3, 3), SmallSquare(5, 4)]))
+        VBB.
+        VBB.
+        ..HH
+        ....
+        ...S
+        """
+        cells = ["."] * (ROWS * COLUMNS)
+        for kind in range(len(PIECE_TYPES)):
+            for cell in range(ROWS * COLUMNS):
+                if self._corners[kind] >> cell & 1:
+                    footprint = _SLIDES[kind][cell][0]
+                    for covered in range(ROWS * COLUMNS):
+                        if footprint >> covered & 1:
+                            cells[covered] = _CHARS[kind]
+        return "\n".join(["".join(cells[row:row + COLUMNS])
+                          for row in range(0, ROWS * COLUMNS, COLUMNS)])
+
+    def extensions(self):
+        """
+        Yield the extensions of ThreeKingdomsPuzzle self: one piece slid
+        one cell up, down, left or right into empty cells.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: generator[ThreeKingdomsPuzzle]
+
+        >>> puzzle = ThreeKingdomsPuzzle([BigSquare(1, 1), HorRec(3, 1),
+        ...                               SmallSquare(1, 4)])
+        >>> for ext in puzzle.extensions():
+        ...     print(ext)
+        ...     print("----")
+        .BBS
+        .BB.
+        HH..
+        ....
+        ....
+        ----
+        BB..
+        BB.S
+        HH..
+        ....
+        ....
+        ----
+        BBS.
+        BB..
+        HH..
+        ....
+        ....
+        ----
+        BB.S
+        BB..
+        ....
+        HH..
+        ....
+        ----
+        BB.S
+        BB..
+        .HH.
+        ....
+        ....
+        ----
+        """
+        corners, occupied = self._corners, self._occupied
+        for kind in range(len(corners)):
+            mask = corners[kind]
+            while mask:
+                corner = mask & -mask
+                mask ^= corner
+                cell = corner.bit_length() - 1
+                for new_cell, needed, changed in _SLIDES[kind][cell][1]:
+                    if not needed & occupied:
+                        moved = list(corners)
+                        moved[kind] ^= corner | 1 << new_cell
+                        yield ThreeKingdomsPuzzle._trusted(
+                            tuple(moved), occupied ^ changed)
+
+    def is_solved(self):
+        """
+        Return whether ThreeKingdomsPuzzle self is solved, with a big
+        square at row 4, column 2, right above the opening.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: bool
+
+        >>> ThreeKingdomsPuzzle([BigSquare(4, 2)]).is_solved()
+        True
+        >>> ThreeKingdomsPuzzle([BigSquare(4, 3)]).is_solved()
+        False
+        """
+        return bool(self._corners[0] >> GOAL_CELL & 1)
+
+    def fail_fast(self):
+        """
+        Return whether ThreeKingdomsPuzzle self can never be solved: there
+        is no big square, or fewer than two empty cells, so that no big
+        square can ever move.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: bool
+
+        >>> ThreeKingdomsPuzzle([SmallSquare(1, 1)]).fail_fast()
+        True
+        >>> ThreeKingdomsPuzzle([BigSquare(1, 1)]).fail_fast()
+        False
+        """
+        return (not self._corners[0] or
+                ROWS * COLUMNS - self._occupied.bit_count() < 2)
+
+    def heuristic(self):
+        """
+        Return the fewest one-cell slides that bring a big square of
+        ThreeKingdomsPuzzle self to its goal, ignoring every other piece.
+
+        @type self: ThreeKingdomsPuzzle
+        @rtype: int
+
+        >>> ThreeKingdomsPuzzle([BigSquare(1, 1)]).heuristic()
+        4
+        """
+        goal_row, goal_column = divmod(GOAL_CELL, COLUMNS)
+        best, mask = 0, self._corners[0]
+        if mask:
+            best = ROWS + COLUMNS
+        while mask:
+            corner = mask & -mask
+            mask ^= corner
+            row, column = divmod(corner.bit_length() - 1, COLUMNS)
+            best = min(best, abs(row - goal_row) + abs(column - goal_column))
+        return best
+
+
+if __name__ == "__main__":
+    import doctest
+
+    doctest.testmod()
+    from puzzle_tools import breadth_first_solve, count_nodes
+
+    # the classic layout, "Heng Dao Li Ma"
+    puzzle = ThreeKingdomsPuzzle([
+        VerRec(1, 1), BigSquare(1, 2), VerRec(1, 4),
+        VerRec(3, 1), HorRec(3, 2), VerRec(3, 4),
+        SmallSquare(4, 2), SmallSquare(4, 3),
+        SmallSquare(5, 1), SmallSquare(5, 4)])
+    print(puzzle)
+    import time
+
+    start = time.time()
+    solution = breadth_first_solve(puzzle)
+    end = time.time()
+    print("Solved Three Kingdoms in {} slides and {} seconds.".format(
+        count_nodes(solution) - 1, end - start))
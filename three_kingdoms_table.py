@@ -0,0 +1,311 @@
+"""
+Tables of the distance to a solution of every solvable ThreeKingdomsPuzzle
+with a given set of pieces, stored on disk and memory-mapped, so that a
+puzzle is solved by walking down the distances instead of searching.
+
+A table is built once by breadth-first search backwards from every
+solved placement of the pieces. Slides can always be undone, so the
+puzzles reached are exactly the solvable ones, each at its fewest slides
+from a solution. Puzzles are identified by state_key, which treats pieces
+of the same type as interchangeable.
+
+Table file layout, with every number an unsigned 64-bit int in native byte
+order:
+
+    header      magic bytes, then byte-order mark, the number of big
+                squares, small squares, horizontal and vertical rectangles,
+                the number of puzzles and the CRC-32 of the rest of the
+                file
+    keys        the state keys of the puzzles in increasing order, each
+                as KEY_SIZE big-endian bytes
+    distances   one byte per puzzle, in the same order: its fewest slides
+                to a solution
+"""
+from array import array
+from collections import deque
+import mmap
+import os
+import zlib
+from puzzle_tools import create_node_path
+from three_kingdoms_puzzle import (ThreeKingdomsPuzzle, BigSquare,
+                                   SmallSquare, HorRec, VerRec, PIECE_TYPES,
+                                   ROWS, COLUMNS, GOAL_CELL, _SLIDES)
+
+_MAGIC = b"TKDIST01"
+_BYTE_ORDER_MARK = 0x0102030405060708
+# byte-order mark, four piece counts, puzzle count, checksum
+_HEADER_SIZE = len(_MAGIC) + 8 * 7
+# bytes per state key: four 20-bit corner masks
+KEY_SIZE = 10
+# loaded DistanceTable per absolute path
+_TABLES = {}
+
+
+def piece_counts(puzzle):
+    """
+    Return the number of big squares, small squares, horizontal and
+    vertical rectangles of ThreeKingdomsPuzzle puzzle.
+
+    @type puzzle: ThreeKingdomsPuzzle
+    @rtype: tuple[int, int, int, int]
+
+    >>> piece_counts(ThreeKingdomsPuzzle([BigSquare(1, 1), VerRec(3, 1),
+    ...                                   VerRec(3, 2)]))
+    (1, 0, 0, 2)
+    """
+    key, cells = puzzle.state_key(), ROWS * COLUMNS
+    mask = (1 << cells) - 1
+    return tuple([(key >> (kind * cells) & mask).bit_count()
+                  for kind in range(len(PIECE_TYPES))])
+
+
+def _solved_puzzles(counts):
+    """
+    Return every solved ThreeKingdomsPuzzle with counts big squares, small
+    squares, horizontal and vertical rectangles, up to swaps of identical
+    pieces.
+
+    @type counts: tuple[int, int, int, int]
+    @rtype: list[ThreeKingdomsPuzzle]
+
+    >>> len(_solved_puzzles((1, 0, 0, 0))), len(_solved_puzzles((1, 1, 0, 0)))
+    (1, 16)
+    """
+    solved = []
+    # (kind, cell) of the pieces placed so far, starting with a big square
+    # at the goal
+    pieces = [(0, GOAL_CELL)]
+
+    def place(kind, first, left, occupied):
+        # Place left more pieces of kind, at cells from first on in
+        # increasing order so that each placement is found once, and then
+        # the pieces of the later kinds.
+        #
+        # @type kind: int
+        # @type first: int
+        # @type left: int
+        # @type occupied: int
+        # @rtype: None
+        while not left:
+            kind += 1
+            if kind == len(counts):
+                solved.append(ThreeKingdomsPuzzle(
+                    [PIECE_TYPES[k](c // COLUMNS + 1, c % COLUMNS + 1)
+                     for k, c in pieces]))
+                return
+            first, left = 0, counts[kind]
+        for cell in range(first, ROWS * COLUMNS):
+            entry = _SLIDES[kind][cell]
+            if entry is not None and not entry[0] & occupied:
+                pieces.append((kind, cell))
+                place(kind, cell + 1, left - 1, occupied | entry[0])
+                pieces.pop()
+
+    if counts[0]:
+        place(0, 0, counts[0] - 1, _SLIDES[0][GOAL_CELL][0])
+    return solved
+
+
+def build_distance_table(counts, path):
+    """
+    Write the distance table of ThreeKingdomsPuzzles with counts big
+    squares, small squares, horizontal and vertical rectangles to path.
+
+    The file is written under a temporary name and then moved into place,
+    so processes loading the table never see it half written.
+
+    @type counts: tuple[int, int, int, int]
+    @type path: str
+    @rtype: None
+    """
+    # retrograde breadth-first search from every solved puzzle at once
+    distances = {}
+    queue = deque()
+    for puzzle in _solved_puzzles(counts):
+        distances[puzzle.state_key()] = 0
+        queue.append(puzzle)
+    while queue:
+        puzzle = queue.popleft()
+        distance = distances[puzzle.state_key()] + 1
+        for extension in puzzle.extensions():
+            key = extension.state_key()
+            if key not in distances:
+                distances[key] = distance
+                queue.append(extension)
+    if distances and max(distances.values()) > 255:
+        raise ValueError("distances over 255 slides do not fit the table")
+
+    keys = sorted(distances)
+    body = b"".join([key.to_bytes(KEY_SIZE, "big") for key in keys]) + \
+        bytes([distances[key] for key in keys])
+    header = array("Q", [_BYTE_ORDER_MARK] + list(counts) +
+                   [len(keys), zlib.crc32(body)])
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary_path, "wb") as table_file:
+        table_file.write(_MAGIC)
+        table_file.write(header.tobytes())
+        table_file.write(body)
+    os.replace(temporary_path, path)
+
+
+class DistanceTable:
+    """
+    A memory-mapped distance table written by build_distance_table.
+    """
+
+    def __init__(self, path):
+        """
+        Map the distance table file at path.
+
+        @type self: DistanceTable
+        @type path: str
+        @rtype: None
+        """
+        with open(path, "rb") as table_file:
+            self._map = mmap.mmap(table_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        if (len(self._map) < _HEADER_SIZE or
+                self._map[:len(_MAGIC)] != _MAGIC):
+            raise ValueError("{} is not a distance table".format(path))
+        header = memoryview(self._map)[len(_MAGIC):_HEADER_SIZE].cast("Q")
+        if header[0] != _BYTE_ORDER_MARK:
+            raise ValueError(
+                "{} was written with another byte order".format(path))
+        self.counts = tuple(header[1:5])
+        self._size, self._checksum = header[5:]
+        self._distances_start = _HEADER_SIZE + KEY_SIZE * self._size
+        if len(self._map) != self._distances_start + self._size:
+            raise ValueError("{} is truncated".format(path))
+
+    def __len__(self):
+        """
+        Return the number of puzzles in DistanceTable self.
+
+        @type self: DistanceTable
+        @rtype: int
+        """
+        return self._size
+
+    def verify(self):
+        """
+        Return whether the contents of DistanceTable self match the
+        checksum they were written with.
+
+        @type self: DistanceTable
+        @rtype: bool
+        """
+        return zlib.crc32(self._map[_HEADER_SIZE:]) == self._checksum
+
+    def distance(self, puzzle):
+        """
+        Return the fewest slides that solve ThreeKingdomsPuzzle puzzle, or
+        -1 if it cannot be solved or has other pieces than the table. This
+        is a binary search among the sorted keys.
+
+        @type self: DistanceTable
+        @type puzzle: ThreeKingdomsPuzzle
+        @rtype: int
+        """
+        encoded = puzzle.state_key().to_bytes(KEY_SIZE, "big")
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            start = _HEADER_SIZE + KEY_SIZE * middle
+            if self._map[start:start + KEY_SIZE] < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        start = _HEADER_SIZE + KEY_SIZE * low
+        if low < self._size and \
+                self._map[start:start + KEY_SIZE] == encoded:
+            return self._map[self._distances_start + low]
+        return -1
+
+    def solve(self, puzzle):
+        """
+        Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+        containing a solution, as puzzle_tools solvers do, or None if
+        ThreeKingdomsPuzzle puzzle cannot be solved or has other pieces
+        than the table.
+
+        No search is needed: each step takes an extension one slide
+        closer to a solution.
+
+        @type self: DistanceTable
+        @type puzzle: ThreeKingdomsPuzzle
+        @rtype: PuzzleNode | None
+        """
+        distance = self.distance(puzzle)
+        if distance < 0 or piece_counts(puzzle) != self.counts:
+            return None
+        path = [puzzle]
+        while distance:
+            distance -= 1
+            for extension in path[-1].extensions():
+                if self.distance(extension) == distance:
+                    path.append(extension)
+                    break
+        return create_node_path(path)
+
+
+def load_distance_table(counts, path=None):
+    """
+    Return the DistanceTable of ThreeKingdomsPuzzles with counts big
+    squares, small squares, horizontal and vertical rectangles, stored at
+    path (by default a file in the current directory named after counts).
+
+    The table is built if it is missing, unreadable, for other pieces or
+    fails its checksum, and a loaded table is shared by later calls in the
+    same process.
+
+    @type counts: tuple[int, int, int, int]
+    @type path: str | None
+    @rtype: DistanceTable
+    """
+    counts = tuple(counts)
+    if path is None:
+        path = "tk_{}_{}_{}_{}.dist".format(*counts)
+    key = os.path.abspath(path)
+    table = _TABLES.get(key)
+    if table is None or table.counts != counts:
+        try:
+            table = DistanceTable(path)
+        except (OSError, ValueError):
+            table = None
+        if table is None or table.counts != counts or not table.verify():
+            build_distance_table(counts, path)
+            table = DistanceTable(path)
+        _TABLES[key] = table
+    return table
+
+
+def table_solve(puzzle, path=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, or None if ThreeKingdomsPuzzle puzzle cannot be
+    solved, by walking down the distance table of its pieces (see
+    load_distance_table), which is built or loaded on first use.
+
+    @type puzzle: ThreeKingdomsPuzzle
+    @type path: str | None
+    @rtype: PuzzleNode | None
+
+    >>> import tempfile
+    >>> from puzzle_tools import breadth_first_solve, count_nodes
+    >>> directory = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(directory.name, "small.dist")
+    >>> puzzle = ThreeKingdomsPuzzle([BigSquare(1, 2), HorRec(3, 2),
+    ...     VerRec(1, 1), VerRec(1, 4), SmallSquare(3, 1)])
+    >>> count_nodes(table_solve(puzzle, path))
+    13
+    >>> count_nodes(breadth_first_solve(puzzle))
+    13
+    >>> table = load_distance_table((1, 1, 1, 2), path)
+    >>> table.verify(), table.distance(puzzle)
+    (True, 12)
+    >>> table.distance(ThreeKingdomsPuzzle([BigSquare(1, 2)]))
+    -1
+    >>> del table
+    >>> directory.cleanup()
+    """
+    return load_distance_table(piece_counts(puzzle), path).solve(puzzle)
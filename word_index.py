@@ -0,0 +1,344 @@
+"""
+A compiled index of the words in a words file and of the one-character
+steps between them, stored on disk and memory-mapped, for use as the word
+set of WordLadderPuzzles.
+
+Loading an index only maps the file, so it takes milliseconds, and the
+pages are shared read-only between all processes that map the same file.
+load_word_index rebuilds the index whenever the words file changes.
+
+Index file layout, with every number an unsigned int in native byte order:
+
+    header        magic bytes, then 64-bit byte-order mark, size and
+                  mtime (ns) of the words file, word count, longest word
+                  length and step count
+    offsets       32-bit, word count + 1: start of each word in text
+    lengths       32-bit, longest length + 2: first word of each length
+    step_starts   32-bit, word count + 1: start of each word's steps
+    steps         32-bit, step count: word numbers, as in WordGraph order
+    back_starts   32-bit, word count + 1: start of each word's back steps
+    back_steps    32-bit, step count: numbers of the words stepping into
+                  each word, as in WordGraph.predecessors order
+    text          the UTF-8 words, back to back
+
+Words are numbered in order of length and then of UTF-8 bytes, so the
+words of one length are consecutive and sorted.
+"""
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+from word_ladder_puzzle import WordGraph
+
+_MAGIC = b"WLADIDX2"
+_BYTE_ORDER_MARK = 0x0102030405060708
+# byte-order mark, source size, source mtime, words, longest, steps
+_HEADER_SIZE = len(_MAGIC) + 8 * 6
+
+# loaded WordIndex per absolute index path
+_INDEXES = {}
+
+
+def build_word_index(words_path, index_path):
+    """
+    Write the index of the words in the file at words_path to index_path.
+
+    The file is written under a temporary name and then moved into place,
+    so processes loading the index never see it half written.
+
+    @type words_path: str
+    @type index_path: str
+    @rtype: None
+    """
+    status = os.stat(words_path)
+    with open(words_path, "r", encoding="UTF-8") as words_file:
+        word_set = set(words_file.read().split())
+    words = sorted(word_set, key=lambda w: (len(w), w.encode("UTF-8")))
+    number_of = {}
+    for i in range(len(words)):
+        number_of[words[i]] = i
+    longest = len(words[-1]) if words else 0
+
+    text, offsets = bytearray(), array("I", [0])
+    for word in words:
+        text += word.encode("UTF-8")
+        offsets.append(len(text))
+    word_lengths = [len(word) for word in words]
+    lengths = array("I", [bisect_left(word_lengths, length)
+                          for length in range(longest + 2)])
+    graph = WordGraph(word_set)
+    step_starts, steps = array("I", [0]), array("I")
+    back_starts, back_steps = array("I", [0]), array("I")
+    for word in words:
+        steps.extend([number_of[other] for other in graph.neighbours(word)])
+        step_starts.append(len(steps))
+        back_steps.extend([number_of[other]
+                           for other in graph.predecessors(word)])
+        back_starts.append(len(back_steps))
+
+    header = array("Q", [_BYTE_ORDER_MARK, status.st_size,
+                         status.st_mtime_ns, len(words), longest,
+                         len(steps)])
+    temporary_path = "{}.{}.tmp".format(index_path, os.getpid())
+    with open(temporary_path, "wb") as index_file:
+        index_file.write(_MAGIC)
+        index_file.write(header.tobytes())
+        for section in (offsets, lengths, step_starts, steps, back_starts,
+                        back_steps):
+            index_file.write(section.tobytes())
+        index_file.write(text)
+    os.replace(temporary_path, index_path)
+
+
+class WordIndex:
+    """
+    A memory-mapped word index written by build_word_index.
+
+    A WordIndex can stand in for the word set of a WordLadderPuzzle: it
+    supports len, iteration and membership tests, and provides neighbours
+    like a WordGraph.
+    """
+
+    def __init__(self, index_path, chars="abcdefghijklmnopqrstuvwxyz"):
+        """
+        Map the index file at index_path.
+
+        chars must be the characters the index was built with, and is only
+        used for words outside the index.
+
+        @type self: WordIndex
+        @type index_path: str
+        @type chars: str
+        @rtype: None
+        """
+        with open(index_path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        # what the index is mapped again from when unpickled; the words
+        # file is only known for indexes returned by load_word_index
+        self._index_path = os.path.abspath(index_path)
+        self._words_path = None
+        if (len(self._map) < _HEADER_SIZE or
+                self._map[:len(_MAGIC)] != _MAGIC):
+            raise ValueError("{} is not a word index".format(index_path))
+        view = memoryview(self._map)
+        header = view[len(_MAGIC):_HEADER_SIZE].cast("Q")
+        if header[0] != _BYTE_ORDER_MARK:
+            raise ValueError(
+                "{} was written with another byte order".format(index_path))
+        (self.source_size, self.source_mtime, word_count, longest,
+         step_count) = header[1:]
+        self._chars = chars
+
+        sizes = [word_count + 1, longest + 2, word_count + 1, step_count,
+                 word_count + 1, step_count]
+        if len(self._map) < _HEADER_SIZE + 4 * sum(sizes):
+            raise ValueError("{} is truncated".format(index_path))
+        sections, start = [], _HEADER_SIZE
+        for size in sizes:
+            sections.append(view[start:start + 4 * size].cast("I"))
+            start += 4 * size
+        (self._offsets, self._lengths, self._step_starts, self._steps,
+         self._back_starts, self._back_steps) = sections
+        self._text_start = start
+        if len(self._map) != start + self._offsets[-1]:
+            raise ValueError("{} is truncated".format(index_path))
+
+    def is_current(self, status):
+        """
+        Return whether WordIndex self was built from a words file with
+        os.stat result status.
+
+        @type self: WordIndex
+        @type status: os.stat_result
+        @rtype: bool
+        """
+        return (self.source_size == status.st_size and
+                self.source_mtime == status.st_mtime_ns)
+
+    def __reduce__(self):
+        """
+        Return how to pickle WordIndex self: by the paths it was loaded
+        from, since the mapped file itself cannot be pickled. It is loaded
+        again when unpickled, with load_word_index if it came from there.
+
+        @type self: WordIndex
+        @rtype: tuple
+        """
+        if self._words_path is not None:
+            return load_word_index, (self._words_path, self._index_path)
+        return WordIndex, (self._index_path, self._chars)
+
+    def __len__(self):
+        """
+        Return the number of words in WordIndex self.
+
+        @type self: WordIndex
+        @rtype: int
+        """
+        return len(self._offsets) - 1
+
+    def _encoded(self, number):
+        # Return the UTF-8 bytes of word number in WordIndex self.
+        #
+        # @type self: WordIndex
+        # @type number: int
+        # @rtype: bytes
+        start = self._text_start
+        return self._map[start + self._offsets[number]:
+                         start + self._offsets[number + 1]]
+
+    def word(self, number):
+        """
+        Return word number of WordIndex self.
+
+        @type self: WordIndex
+        @type number: int
+        @rtype: str
+        """
+        return self._encoded(number).decode("UTF-8")
+
+    def __iter__(self):
+        """
+        Yield the words of WordIndex self, shortest first.
+
+        @type self: WordIndex
+        @rtype: generator[str]
+        """
+        for number in range(len(self)):
+            yield self.word(number)
+
+    def number(self, word):
+        """
+        Return the number of word in WordIndex self, or -1 if it is not
+        there. This is a binary search among the words of its length.
+
+        @type self: WordIndex
+        @type word: str
+        @rtype: int
+        """
+        if len(word) + 1 >= len(self._lengths):
+            return -1
+        low, high = self._lengths[len(word)], self._lengths[len(word) + 1]
+        encoded = word.encode("UTF-8")
+        while low < high:
+            middle = (low + high) // 2
+            if self._encoded(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._lengths[len(word) + 1] and \
+                self._encoded(low) == encoded:
+            return low
+        return -1
+
+    def __contains__(self, word):
+        """
+        Return whether word is in WordIndex self.
+
+        @type self: WordIndex
+        @type word: str
+        @rtype: bool
+        """
+        return isinstance(word, str) and self.number(word) >= 0
+
+    def neighbours(self, word):
+        """
+        Return the words of WordIndex self that word changes to in one
+        step, in the same order as WordGraph.neighbours.
+
+        @type self: WordIndex
+        @type word: str
+        @rtype: tuple[str]
+        """
+        number = self.number(word)
+        if number < 0:
+            # not in the index, so try every step
+            steps = []
+            for index in range(len(word)):
+                for char in self._chars:
+                    other = word[:index] + char + word[index + 1:]
+                    if other != word and other in self:
+                        steps.append(other)
+            return tuple(steps)
+        return tuple([self.word(other) for other in
+                      self._steps[self._step_starts[number]:
+                                  self._step_starts[number + 1]]])
+
+    def predecessors(self, word):
+        """
+        Return the words of WordIndex self that change to word in one step,
+        in the same order as WordGraph.predecessors.
+
+        @type self: WordIndex
+        @type word: str
+        @rtype: tuple[str]
+        """
+        number = self.number(word)
+        if number < 0:
+            # steps only ever lead into the index
+            return ()
+        return tuple([self.word(other) for other in
+                      self._back_steps[self._back_starts[number]:
+                                       self._back_starts[number + 1]]])
+
+
+def load_word_index(words_path="words", index_path=None):
+    """
+    Return the WordIndex of the words file at words_path, stored at
+    index_path (by default words_path with ".idx" added).
+
+    The index is built if it is missing, unreadable or older than the
+    words file, and a loaded index is shared by later calls in the same
+    process.
+
+    @type words_path: str
+    @type index_path: str | None
+    @rtype: WordIndex
+
+    >>> import tempfile
+    >>> directory = tempfile.TemporaryDirectory()
+    >>> words_path = os.path.join(directory.name, "words")
+    >>> with open(words_path, "w") as words_file:
+    ...     _ = words_file.write("cost cast case came same some A Same")
+    >>> index = load_word_index(words_path)
+    >>> len(index), "same" in index, "sale" in index
+    (8, True, False)
+    >>> index.neighbours("same"), index.neighbours("sane")
+    (('came', 'some'), ('same',))
+    >>> index.predecessors("same")
+    ('Same', 'came', 'some')
+    >>> load_word_index(words_path) is index
+    True
+    >>> with open(words_path, "a") as words_file:
+    ...     _ = words_file.write(" sane")
+    >>> index = load_word_index(words_path)
+    >>> index.neighbours("same")
+    ('came', 'some', 'sane')
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> from puzzle_tools import breadth_first_solve, count_nodes
+    >>> count_nodes(breadth_first_solve(
+    ...     WordLadderPuzzle("same", "cost", index)))
+    5
+    >>> import pickle
+    >>> pickle.loads(pickle.dumps(index)) is index
+    True
+    >>> del index
+    >>> directory.cleanup()
+    """
+    if index_path is None:
+        index_path = words_path + ".idx"
+    status = os.stat(words_path)
+    key = os.path.abspath(index_path)
+    if key in _INDEXES and _INDEXES[key].is_current(status):
+        return _INDEXES[key]
+    try:
+        index = WordIndex(index_path)
+    except (OSError, ValueError):
+        index = None
+    if index is None or not index.is_current(status):
+        build_word_index(words_path, index_path)
+        index = WordIndex(index_path)
+    index._words_path = os.path.abspath(words_path)
+    _INDEXES[key] = index
+    return index
@@ -1,4 +1,164 @@
 from puzzle import Puzzle
+from collections import deque, OrderedDict
+import weakref
+
+# WordGraph of each word set in use, keyed by id of the set; see word_graph
+_GRAPHS = {}
+
+# number of ladder trees kept by ladder_tree, and the trees themselves,
+# least recently used first, keyed by (id of graph, source word); graphs are
+# only weakly referenced, and their trees are dropped once they are gone
+LADDER_TREE_CACHE_SIZE = 32
+_TREES = OrderedDict()
+
+
+class WordGraph:
+    """
+    Index of the one-character steps between the words of a word set.
+
+    Words are put in buckets by wildcard pattern, one pattern per position
+    with that character replaced by "_" (so "same" is in the buckets
+    "_ame", "s_me", "sa_e" and "sam_"), and the words one step away from a
+    word are then read off the buckets of its own patterns. Only steps to
+    a character in chars count, as in WordLadderPuzzle.extensions.
+
+    Steps never change the length of a word, so the buckets for words of
+    each length are only built when a word of that length is first asked
+    about.
+
+    The word set must not change once a WordGraph has been built from it.
+    """
+
+    def __init__(self, ws, chars="abcdefghijklmnopqrstuvwxyz"):
+        """
+        Create the WordGraph of word set ws.
+
+        @type self: WordGraph
+        @type ws: set[str]
+        @type chars: str
+        @rtype: None
+        """
+        self._chars = chars
+        # words of ws by length, until their buckets are built
+        self._unindexed = {}
+        for word in ws:
+            if len(word) in self._unindexed:
+                self._unindexed[len(word)].append(word)
+            else:
+                self._unindexed[len(word)] = [word]
+        self._buckets = {}
+        # steps out of and into each word asked about so far
+        self._neighbours, self._predecessors = {}, {}
+
+    def _index(self, length):
+        # Put the words of WordGraph self with length characters in their
+        # buckets, unless that is already done.
+        #
+        # @type self: WordGraph
+        # @type length: int
+        # @rtype: None
+        words = self._unindexed.pop(length, [])
+        buckets = {}
+        for word in words:
+            for index in range(length):
+                pattern = word[:index] + "_" + word[index + 1:]
+                if pattern in buckets:
+                    buckets[pattern].append(word)
+                else:
+                    buckets[pattern] = [word]
+        # even a bucket holding a single word gives a step to it from words
+        # outside the word set, such as a start word, so every bucket is
+        # kept, sorted so that steps come out in order of character
+        for pattern in buckets:
+            self._buckets[pattern] = sorted(buckets[pattern])
+
+    def neighbours(self, word):
+        """
+        Return the words of WordGraph self that word changes to in one
+        step, ordered by the position changed and then by the new
+        character.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: tuple[str]
+
+        >>> graph = WordGraph({"same", "came", "some", "sane", "Same"})
+        >>> graph.neighbours("same")
+        ('came', 'some', 'sane')
+        >>> graph.neighbours("Same")
+        ('came', 'same')
+        >>> graph.neighbours("xame")
+        ('came', 'same')
+        """
+        if word not in self._neighbours:
+            if len(word) in self._unindexed:
+                self._index(len(word))
+            steps = []
+            for index in range(len(word)):
+                pattern = word[:index] + "_" + word[index + 1:]
+                for other in self._buckets.get(pattern, ()):
+                    if other != word and other[index] in self._chars:
+                        steps.append(other)
+            self._neighbours[word] = tuple(steps)
+        return self._neighbours[word]
+
+    def predecessors(self, word):
+        """
+        Return the words of WordGraph self that change to word in one step,
+        ordered by the position changed and then by their character there.
+
+        word itself must be in the word set.
+
+        @type self: WordGraph
+        @type word: str
+        @rtype: tuple[str]
+
+        >>> graph = WordGraph({"same", "came", "some", "sane", "Same"})
+        >>> graph.predecessors("same")
+        ('Same', 'came', 'some', 'sane')
+        >>> graph.predecessors("Same")
+        ()
+        """
+        if word not in self._predecessors:
+            if len(word) in self._unindexed:
+                self._index(len(word))
+            steps = []
+            for index in range(len(word)):
+                if word[index] not in self._chars:
+                    continue
+                pattern = word[:index] + "_" + word[index + 1:]
+                for other in self._buckets.get(pattern, ()):
+                    if other != word:
+                        steps.append(other)
+            self._predecessors[word] = tuple(steps)
+        return self._predecessors[word]
+
+
+def word_graph(ws):
+    """
+    Return the WordGraph of word set ws, building it the first time it is
+    asked for and sharing it afterwards for as long as ws exists.
+
+    A word set that can list steps itself, such as a word_index.WordIndex,
+    is its own graph.
+
+    @type ws: set[str] | WordIndex
+    @rtype: WordGraph | WordIndex
+
+    >>> ws = {"same", "came"}
+    >>> word_graph(ws) is word_graph(ws)
+    True
+    """
+    if hasattr(ws, "neighbours"):
+        return ws
+    key = id(ws)
+    if key in _GRAPHS and _GRAPHS[key][0]() is ws:
+        return _GRAPHS[key][1]
+    graph = WordGraph(ws)
+    # forget the graph once ws is garbage collected
+    _GRAPHS[key] = (weakref.ref(ws, lambda _: _GRAPHS.pop(key, None)),
+                    graph)
+    return graph
 
 
 class WordLadderPuzzle(Puzzle):
@@ -15,13 +175,16 @@ class WordLadderPuzzle(Puzzle):
         @type self: WordLadderPuzzle
         @type from_word: str
         @type to_word: str
-        @type ws: set[str]
+        @type ws: set[str] | WordIndex
         @rtype: None
         """
         (self._from_word, self._to_word, self._word_set) = (from_word,
                                                             to_word, ws)
         # set of characters to use for 1-character changes
         self._chars = "abcdefghijklmnopqrstuvwxyz"
+        # WordGraph of ws, looked up on first use and handed on to
+        # extensions
+        self._graph = None
 
     # TODO
     # implement __eq__ and __str__
@@ -48,6 +211,20 @@ class WordLadderPuzzle(Puzzle):
                 self._to_word == other._to_word and
                 self._word_set == other._word_set)
 
+    __hash__ = Puzzle.__hash__
+
+    def state_key(self):
+        """
+        Return a hashable key for the current word of WordLadderPuzzle self.
+
+        @param self: WordLadderPuzzle
+        @return: str
+
+        >>> WordLadderPuzzle("meow", "woof", {"meow", "woof"}).state_key()
+        'meow'
+        """
+        return self._from_word
+
     def __str__(self):
         """
         Return a user-friendly string representation of WordLadderPuzzle self.
@@ -69,10 +246,10 @@ class WordLadderPuzzle(Puzzle):
 
     def extensions(self):
         """
-        Return a list of extensions of WordLadderPuzzle self.
+        Yield the extensions of WordLadderPuzzle self.
 
         @param self: WordLadderPuzzle
-        @return: list[WordLadderPuzzle]
+        @return: generator[WordLadderPuzzle]
 
         >>> with open("words", "r", encoding='UTF-8') as words:
         ...     word_set = set(words.read().split())
@@ -94,20 +271,61 @@ class WordLadderPuzzle(Puzzle):
         From 'sane' to 'cost'
         From 'sate' to 'cost'
         From 'save' to 'cost'
+
+        The start word need not be in the word set:
+
+        >>> puzzle = WordLadderPuzzle("xame", "came", {"came", "cost"})
+        >>> for ext in puzzle.extensions():
+        ...     print(ext)
+        From 'came' to 'came'
         """
-        final_list = []
-        for index in range(len(self._from_word)):
-            for char in self._chars:
-                possible_ext = [letter for letter in self._from_word]
-                possible_ext[index] = char
-                possible_word = ''.join(possible_ext)
-                if (possible_word in self._word_set and
-                        possible_word != self._from_word):
-                    final_list.append(
-                        WordLadderPuzzle(possible_word,
-                                         self._to_word,
-                                         self._word_set))
-        return final_list
+        if self._graph is None:
+            self._graph = word_graph(self._word_set)
+        for word in self._graph.neighbours(self._from_word):
+            extension = WordLadderPuzzle(word, self._to_word, self._word_set)
+            extension._graph = self._graph
+            yield extension
+
+    def reverse_extensions(self):
+        """
+        Yield the WordLadderPuzzles that WordLadderPuzzle self is an
+        extension of.
+
+        @param self: WordLadderPuzzle
+        @return: generator[WordLadderPuzzle]
+
+        >>> words = {"same", "came", "some", "Same"}
+        >>> puzzle = WordLadderPuzzle("same", "cost", words)
+        >>> for ext in puzzle.reverse_extensions():
+        ...     print(ext)
+        From 'Same' to 'cost'
+        From 'came' to 'cost'
+        From 'some' to 'cost'
+        """
+        # steps only ever lead into the word set
+        if self._from_word not in self._word_set:
+            return
+        if self._graph is None:
+            self._graph = word_graph(self._word_set)
+        for word in self._graph.predecessors(self._from_word):
+            extension = WordLadderPuzzle(word, self._to_word, self._word_set)
+            extension._graph = self._graph
+            yield extension
+
+    def goal(self):
+        """
+        Return the solved WordLadderPuzzle that WordLadderPuzzle self is
+        working towards.
+
+        @param self: WordLadderPuzzle
+        @return: WordLadderPuzzle
+
+        >>> print(WordLadderPuzzle("same", "cost", {"same", "cost"}).goal())
+        From 'cost' to 'cost'
+        """
+        goal = WordLadderPuzzle(self._to_word, self._to_word, self._word_set)
+        goal._graph = self._graph
+        return goal
 
     # TODO
     # override is_solved
@@ -127,13 +345,125 @@ class WordLadderPuzzle(Puzzle):
         """
         return self._from_word == self._to_word
 
+    def heuristic(self):
+        """
+        Return the number of positions where _from_word differs from
+        _to_word, which is a lower bound on the steps left, since each step
+        changes a single character.
+
+        @param self: WordLadderPuzzle
+        @return: int
+
+        >>> WordLadderPuzzle("same", "cost", {"same", "cost"}).heuristic()
+        4
+        """
+        distance = abs(len(self._from_word) - len(self._to_word))
+        for a, b in zip(self._from_word, self._to_word):
+            if a != b:
+                distance += 1
+        return distance
+
+
+def ladder_tree(source, ws):
+    """
+    Return a dict mapping each word that can be reached from source using
+    words in ws to the word it is reached from on a shortest ladder, with
+    source mapped to None.
+
+    The tree comes from a single breadth-first search over word_graph(ws).
+    The LADDER_TREE_CACHE_SIZE most recently used trees are kept, for as
+    long as the word graph they were searched in exists, so repeated
+    queries from the same source word cost one search.
+
+    @type source: str
+    @type ws: set[str] | WordIndex
+    @rtype: dict[str, str | None]
+
+    >>> tree = ladder_tree("same", {"same", "came", "case", "cast", "cost"})
+    >>> tree["cost"], tree["cast"], tree["same"]
+    ('cast', 'case', None)
+    """
+    graph = word_graph(ws)
+    key = (id(graph), source)
+    if key in _TREES and _TREES[key][0]() is graph:
+        _TREES.move_to_end(key)
+        return _TREES[key][1]
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        word = queue.popleft()
+        for other in graph.neighbours(word):
+            if other not in parents:
+                parents[other] = word
+                queue.append(other)
+    _TREES[key] = (weakref.ref(graph, lambda _: _TREES.pop(key, None)),
+                   parents)
+    if len(_TREES) > LADDER_TREE_CACHE_SIZE:
+        _TREES.popitem(last=False)
+    return parents
+
+
+def shortest_ladders(source, targets, ws):
+    """
+    Return a dict mapping each word in targets to a shortest ladder from
+    source to it using words in ws, or to None if there is none.
+
+    Each ladder is a path of PuzzleNodes of WordLadderPuzzles, as returned
+    by puzzle_tools.breadth_first_solve for WordLadderPuzzle(source,
+    target, ws), but all targets share one ladder_tree of source.
+
+    @type source: str
+    @type targets: iterable[str]
+    @type ws: set[str] | WordIndex
+    @rtype: dict[str, PuzzleNode | None]
+
+    >>> from puzzle_tools import iter_path
+    >>> with open("words", "r", encoding='UTF-8') as words:
+    ...     word_set = set(words.read().split())
+    >>> ladders = shortest_ladders("same", ["cost", "sane", "Same"], word_set)
+    >>> for p in iter_path(ladders["cost"]):
+    ...     print(p)
+    From 'same' to 'cost'
+    From 'came' to 'cost'
+    From 'case' to 'cost'
+    From 'cast' to 'cost'
+    From 'cost' to 'cost'
+    >>> for p in iter_path(ladders["sane"]):
+    ...     print(p)
+    From 'same' to 'sane'
+    From 'sane' to 'sane'
+    >>> print(ladders["Same"])
+    None
+    """
+    from puzzle_tools import create_node_path
+    parents = ladder_tree(source, ws)
+    graph = word_graph(ws)
+    ladders = {}
+    for target in targets:
+        if target not in parents:
+            ladders[target] = None
+            continue
+        words = [target]
+        while parents[words[-1]] is not None:
+            words.append(parents[words[-1]])
+        path = []
+        for word in reversed(words):
+            puzzle = WordLadderPuzzle(word, target, ws)
+            puzzle._graph = graph
+            path.append(puzzle)
+        ladders[target] = create_node_path(path)
+    return ladders
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
     from puzzle_tools import breadth_first_solve, depth_first_solve
+    from word_index import load_word_index
     from time import time
-    with open("words", "r") as words:
-        word_set = set(words.read().split())
+    start = time()
+    word_set = load_word_index("words")
+    print("Loaded word index in {} seconds.".format(time() - start))
     w = WordLadderPuzzle("same", "cost", word_set)
     start = time()
     sol = breadth_first_solve(w)